@@ -4,13 +4,21 @@
 """
 
 import sys
-import json
 import time
-import random
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Dict, List
+from typing import Dict, List, Tuple
 import logging
+import numpy as np
+import pandas as pd
+
+# 优先使用orjson加速JSON解析，未安装时回退到标准库
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    import json
+    _json_loads = json.loads
 
 # 添加项目根目录到路径
 project_root = Path(__file__).parent.parent
@@ -29,9 +37,46 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def to_mysql_datetimes(timestamps: List[str]) -> List[str]:
+    """
+    批量将ISO格式时间字符串转换为 MySQL DATETIME 格式
+    
+    Args:
+        timestamps: 时间字符串列表（ISO格式或已是MySQL格式）
+        
+    Returns:
+        MySQL DATETIME 格式字符串列表
+    """
+    if not timestamps:
+        return []
+    
+    try:
+        # 带时区的时间保留其本地时间，与逐条 fromisoformat 的结果一致
+        return pd.to_datetime(timestamps, format='ISO8601').strftime('%Y-%m-%d %H:%M:%S').tolist()
+    except (ValueError, TypeError):
+        # 混合时区等无法整体解析的情况，逐条转换
+        converted = []
+        for timestamp_str in timestamps:
+            if 'T' in timestamp_str:
+                dt = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+                timestamp_str = dt.strftime('%Y-%m-%d %H:%M:%S')
+            converted.append(timestamp_str)
+        return converted
+
+
+# 温度状态查表：下标 = (温度>=27) + (温度>=29)
+STATUS_LABELS = np.array(['normal', 'warning', 'alert'])
+
+
 class DataWriter:
     """数据写入器 - 将JSON数据写入数据库"""
     
+    # 批量写入读数，依赖 (device_id, timestamp) 唯一键在服务端去重：
+    # 已存在的读数保持不变（id = id 为空操作，不改写温度、湿度和状态）
+    BATCH_INSERT_SQL = """INSERT INTO readings (device_id, timestamp, temperature, humidity, status)
+                          VALUES (%s, %s, %s, %s, %s)
+                          ON DUPLICATE KEY UPDATE id = id"""
+    
     def __init__(self, json_file: str = "data/temperature_data.json", 
                  interval: int = 60):
         """
@@ -45,14 +90,15 @@ class DataWriter:
         self.interval = interval
         self.db = DatabaseConnection()
         self.devices_data = None
+        self.rng = np.random.default_rng()
         
     def load_json_data(self) -> Dict:
         """加载JSON数据"""
         if not self.json_file.exists():
             raise FileNotFoundError(f"JSON文件不存在: {self.json_file}")
         
-        with open(self.json_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        with open(self.json_file, 'rb') as f:
+            data = _json_loads(f.read())
         
         self.devices_data = data
         logger.info(f"成功加载JSON数据，共 {len(data.get('devices', []))} 个设备")
@@ -103,96 +149,142 @@ class DataWriter:
         Returns:
             新的读数字典
         """
-        readings = device.get('readings', [])
+        return self.generate_new_readings([device])[0]
+    
+    def generate_new_readings(self, devices: List[Dict]) -> List[Dict]:
+        """
+        批量为多个设备生成新的模拟读数（向量化计算数值和状态）
         
-        if not readings:
-            # 如果没有历史数据，生成默认值
-            base_temp = 25.0
-            base_humidity = 60.0
-        else:
-            # 基于最新读数生成
-            latest = readings[-1]
-            base_temp = latest.get('temperature', 25.0)
-            base_humidity = latest.get('humidity', 60.0)
+        Args:
+            devices: 设备信息字典列表
+            
+        Returns:
+            与devices一一对应的新读数字典列表
+        """
+        n = len(devices)
+        if n == 0:
+            return []
         
-        # 生成随机变化（±2度，±3%湿度）
-        temp_change = random.uniform(-2.0, 2.0)
-        humidity_change = random.uniform(-3.0, 3.0)
+        # 基于最新读数生成，没有历史数据时使用默认值
+        latest = [d['readings'][-1] if d.get('readings') else {} for d in devices]
+        base_temps = np.array([r.get('temperature', 25.0) for r in latest], dtype=np.float64)
+        base_humidity = np.array([r.get('humidity', 60.0) for r in latest], dtype=np.float64)
         
-        new_temp = round(base_temp + temp_change, 1)
-        new_humidity = round(base_humidity + humidity_change, 1)
+        # 生成随机变化（±2度，±3%湿度）
+        new_temps = np.round(base_temps + self.rng.uniform(-2.0, 2.0, size=n), 1)
+        new_humidity = np.round(base_humidity + self.rng.uniform(-3.0, 3.0, size=n), 1)
         
-        # 根据温度确定状态
-        if new_temp >= 29.0:
-            status = "alert"
-        elif new_temp >= 27.0:
-            status = "warning"
-        else:
-            status = "normal"
+        # 根据温度确定状态：>=27 警告，>=29 告警（无分支查表）
+        status_idx = (new_temps >= 27.0).astype(np.int8) + (new_temps >= 29.0).astype(np.int8)
+        statuses = STATUS_LABELS[status_idx]
         
-        return {
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'temperature': new_temp,
-            'humidity': new_humidity,
-            'status': status
-        }
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        return [
+            {
+                'timestamp': timestamp,
+                'temperature': temp,
+                'humidity': humidity,
+                'status': status
+            }
+            for temp, humidity, status in zip(new_temps.tolist(), new_humidity.tolist(), statuses.tolist())
+        ]
     
     def write_reading(self, device_id: str, reading: Dict):
         """
         写入单个读数到数据库
         
+        依赖 (device_id, timestamp) 唯一键，使用 INSERT IGNORE 由服务端去重，
+        无需先查询是否已存在。
+        
         Args:
             device_id: 设备ID
             reading: 读数字典
         """
         try:
-            # 检查是否已存在相同时间戳的读数（避免重复）
-            existing = self.db.execute_query(
-                """SELECT id FROM readings 
-                   WHERE device_id = %s AND timestamp = %s""",
-                (device_id, reading['timestamp'])
+            affected_rows = self.db.execute_update(
+                """INSERT IGNORE INTO readings (device_id, timestamp, temperature, humidity, status)
+                   VALUES (%s, %s, %s, %s, %s)""",
+                (device_id, reading['timestamp'], reading['temperature'], 
+                 reading['humidity'], reading['status'])
             )
             
-            if existing:
+            if not affected_rows:
                 logger.debug(f"读数已存在，跳过: {device_id} @ {reading['timestamp']}")
                 return
             
-            # 插入新读数
-            self.db.execute_update(
-                """INSERT INTO readings (device_id, timestamp, temperature, humidity, status)
-                   VALUES (%s, %s, %s, %s, %s)""",
-                (device_id, reading['timestamp'], reading['temperature'], 
-                 reading['humidity'], reading['status'])
-            )
             logger.info(f"已写入读数: {device_id} - {reading['temperature']}°C @ {reading['timestamp']}")
             
         except Exception as e:
             logger.error(f"写入读数失败: {e}")
             raise
     
-    def write_all_historical_data(self):
-        """写入所有历史数据到数据库（一次性）"""
+    def write_readings_batch(self, device_readings: List[Tuple[str, Dict]]) -> int:
+        """
+        批量写入多个设备的读数（一次数据库往返）
+        
+        Args:
+            device_readings: (设备ID, 读数字典) 列表
+            
+        Returns:
+            受影响的行数
+        """
+        if not device_readings:
+            return 0
+        
+        rows = [
+            (device_id, reading['timestamp'], reading['temperature'],
+             reading['humidity'], reading['status'])
+            for device_id, reading in device_readings
+        ]
+        try:
+            affected_rows = self.db.execute_many(self.BATCH_INSERT_SQL, rows)
+        except Exception as e:
+            logger.error(f"批量写入读数失败: {e}")
+            raise
+        
+        for device_id, reading in device_readings:
+            logger.info(f"已写入读数: {device_id} - {reading['temperature']}°C @ {reading['timestamp']}")
+        return affected_rows
+    
+    def write_all_historical_data(self, batch_size: int = 1000):
+        """
+        写入所有历史数据到数据库（一次性，批量插入）
+        
+        依赖 readings 表的 (device_id, timestamp) 唯一键在服务端去重，
+        不再逐条查询是否存在；所有批次在同一事务中提交。
+        
+        Args:
+            batch_size: 每批写入的读数数量
+        """
         if self.devices_data is None:
             self.load_json_data()
         
         logger.info("开始写入历史数据...")
         devices = self.devices_data.get('devices', [])
         
+        rows = []
         total_readings = 0
-        for device in devices:
-            device_id = device.get('device_id')
-            readings = device.get('readings', [])
-            
-            for reading in readings:
-                # 转换时间格式
-                timestamp_str = reading.get('timestamp')
-                # 从 ISO 格式转换为 MySQL DATETIME 格式
-                if 'T' in timestamp_str:
-                    dt = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-                    reading['timestamp'] = dt.strftime('%Y-%m-%d %H:%M:%S')
+        # 整个导入过程放在一个事务中，只在结束时提交一次
+        with self.db.transaction():
+            for device in devices:
+                device_id = device.get('device_id')
+                readings = device.get('readings', [])
+                
+                # 整个设备的时间戳一次性向量化转换为 MySQL DATETIME 格式
+                timestamps = to_mysql_datetimes([r.get('timestamp') for r in readings])
                 
-                self.write_reading(device_id, reading)
-                total_readings += 1
+                for reading, timestamp in zip(readings, timestamps):
+                    rows.append((device_id, timestamp, reading['temperature'],
+                                 reading['humidity'], reading['status']))
+                    
+                    if len(rows) >= batch_size:
+                        self.db.execute_many(self.BATCH_INSERT_SQL, rows)
+                        total_readings += len(rows)
+                        rows = []
+            
+            if rows:
+                self.db.execute_many(self.BATCH_INSERT_SQL, rows)
+                total_readings += len(rows)
         
         logger.info(f"历史数据写入完成，共写入 {total_readings} 条读数")
     
@@ -212,13 +304,15 @@ class DataWriter:
                 if self.devices_data is None:
                     self.load_json_data()
                 
+                tick_start = time.monotonic()
                 devices = self.devices_data.get('devices', [])
                 
-                # 为每个设备生成并写入新读数
-                for device in devices:
+                # 本轮所有设备的新读数一次性向量化生成，并合并为一次批量写入
+                new_readings = self.generate_new_readings(devices)
+                pending = []
+                for device, new_reading in zip(devices, new_readings):
                     device_id = device.get('device_id')
-                    new_reading = self.generate_new_reading(device)
-                    self.write_reading(device_id, new_reading)
+                    pending.append((device_id, new_reading))
                     
                     # 更新设备数据中的最新读数（用于下次生成）
                     if 'readings' not in device:
@@ -228,8 +322,12 @@ class DataWriter:
                     if len(device['readings']) > 10:
                         device['readings'] = device['readings'][-10:]
                 
-                logger.info(f"等待 {self.interval} 秒后继续...")
-                time.sleep(self.interval)
+                self.write_readings_batch(pending)
+                
+                # 扣除本轮写入耗时，保持固定的写入节奏
+                wait_time = max(0.0, self.interval - (time.monotonic() - tick_start))
+                logger.info(f"等待 {wait_time:.1f} 秒后继续...")
+                time.sleep(wait_time)
                 
         except KeyboardInterrupt:
             logger.info("\n收到停止信号，正在关闭服务...")
@@ -44,7 +44,8 @@ def create_tables():
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         INDEX idx_device_id (device_id),
         INDEX idx_timestamp (timestamp),
-        INDEX idx_device_timestamp (device_id, timestamp),
+        UNIQUE KEY uk_device_timestamp (device_id, timestamp),
+        INDEX idx_readings_dev_ts (device_id, timestamp DESC, temperature, humidity, status),
         FOREIGN KEY (device_id) REFERENCES devices(device_id) ON DELETE CASCADE
     ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
     """
@@ -63,6 +64,9 @@ def create_tables():
             db.execute_update(create_readings_table)
             logger.info("readings 表创建成功")
             
+            ensure_unique_reading_key(db)
+            ensure_covering_reading_index(db)
+            
             logger.info("数据库表创建完成！")
             
     except Exception as e:
@@ -70,6 +74,62 @@ def create_tables():
         raise
 
 
+def ensure_unique_reading_key(db: DatabaseConnection):
+    """
+    确保 readings 表存在 (device_id, timestamp) 唯一键
+    
+    旧版本建表时只有普通索引，这里为已存在的表补充唯一键，
+    使批量写入可以依赖服务端去重。
+    
+    Args:
+        db: 数据库连接
+    """
+    existing = db.execute_query(
+        "SHOW INDEX FROM readings WHERE Key_name = %s",
+        ('uk_device_timestamp',)
+    )
+    if existing:
+        return
+    
+    try:
+        logger.info("为 readings 表添加唯一键 uk_device_timestamp...")
+        db.execute_update(
+            "ALTER TABLE readings ADD UNIQUE KEY uk_device_timestamp (device_id, timestamp)"
+        )
+        logger.info("唯一键添加成功")
+    except Exception as e:
+        logger.warning(f"添加唯一键失败（可能存在重复读数，请先清理）: {e}")
+
+
+def ensure_covering_reading_index(db: DatabaseConnection):
+    """
+    确保 readings 表存在按设备和时间倒序的覆盖索引 idx_readings_dev_ts
+    
+    索引包含查询读数所需的全部列，按设备取最新N条或按时间范围查询时
+    只需扫描索引，无需回表。添加后执行 ANALYZE TABLE 更新统计信息。
+    
+    Args:
+        db: 数据库连接
+    """
+    existing = db.execute_query(
+        "SHOW INDEX FROM readings WHERE Key_name = %s",
+        ('idx_readings_dev_ts',)
+    )
+    if existing:
+        return
+    
+    try:
+        logger.info("为 readings 表添加覆盖索引 idx_readings_dev_ts...")
+        db.execute_update(
+            "CREATE INDEX idx_readings_dev_ts ON readings "
+            "(device_id, timestamp DESC, temperature, humidity, status)"
+        )
+        db.execute_query("ANALYZE TABLE readings")
+        logger.info("覆盖索引添加成功")
+    except Exception as e:
+        logger.warning(f"添加覆盖索引失败: {e}")
+
+
 def check_tables():
     """检查表是否存在"""
     try:
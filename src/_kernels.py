@@ -0,0 +1,254 @@
+"""
+数值计算内核
+热点数值循环集中在这里，安装了numba时使用JIT编译，否则退化为NumPy向量化实现
+"""
+
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 尝试导入numba，如果失败则直接使用NumPy实现
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """numba不可用时的空装饰器"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+
+@njit(cache=True)
+def zscore_anomalies(temps, threshold):
+    """
+    基于Z-score的异常检测内核
+    
+    与pandas保持一致：忽略NaN，标准差使用样本标准差（ddof=1）。
+    
+    Args:
+        temps: 温度数组（float64）
+        threshold: 标准差倍数阈值
+        
+    Returns:
+        (异常点下标数组, 各点Z-score绝对值数组, 均值)
+    """
+    empty_idx = np.empty(0, dtype=np.int64)
+    valid = ~np.isnan(temps)
+    values = temps[valid]
+    n = values.size
+    if n < 2:
+        return empty_idx, np.zeros(temps.size), np.nan
+    
+    mean = values.mean()
+    std = np.sqrt(((values - mean) ** 2).sum() / (n - 1))
+    if std == 0:
+        return empty_idx, np.zeros(temps.size), mean
+    
+    z_scores = np.abs((temps - mean) / std)
+    idx = np.nonzero(z_scores > threshold)[0].astype(np.int64)
+    return idx, z_scores, mean
+
+
+def _nan_summary_numpy(values):
+    """
+    NumPy实现的忽略NaN汇总（numba不可用时使用）
+    
+    Args:
+        values: 数值数组（float64）
+        
+    Returns:
+        (有效值个数, 求和, 最小值, 最大值)；无有效值时极值为0
+    """
+    valid = values[~np.isnan(values)]
+    if valid.size == 0:
+        return 0, 0.0, 0.0, 0.0
+    return valid.size, float(valid.sum()), float(valid.min()), float(valid.max())
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def nan_summary(values):
+        """
+        单次遍历计算忽略NaN的个数、求和与极值
+        
+        一个循环内完成全部归约，不生成过滤后的临时数组。
+        
+        Args:
+            values: 数值数组（float64）
+            
+        Returns:
+            (有效值个数, 求和, 最小值, 最大值)；无有效值时极值为0
+        """
+        count = 0
+        total = 0.0
+        vmin = np.inf
+        vmax = -np.inf
+        for v in values:
+            if np.isnan(v):
+                continue
+            count += 1
+            total += v
+            if v < vmin:
+                vmin = v
+            if v > vmax:
+                vmax = v
+        if count == 0:
+            return 0, 0.0, 0.0, 0.0
+        return count, total, vmin, vmax
+else:
+    nan_summary = _nan_summary_numpy
+
+
+@njit(cache=True)
+def lttb_indices(x, values, n_out):
+    """
+    LTTB（Largest-Triangle-Three-Buckets）降采样，返回保留点的下标
+    
+    按点数等分桶，每个桶保留与前一个保留点、下一个桶均值构成三角形面积最大的点，
+    峰值和拐点得以保留；三角形面积按实际横坐标（如时间戳秒数）计算，采样间隔不均匀
+    时同样准确。首尾两点总是保留；NaN点不会被选中（整桶为NaN时取桶内第一个点）。
+    
+    Args:
+        x: 横坐标数组（float64，升序）
+        values: 数值数组（float64）
+        n_out: 目标点数
+        
+    Returns:
+        升序的下标数组（int64）；点数不超过 n_out 时返回全部下标
+    """
+    n = values.size
+    if n_out >= n or n_out < 3:
+        return np.arange(n).astype(np.int64)
+    
+    out = np.empty(n_out, dtype=np.int64)
+    out[0] = 0
+    out[n_out - 1] = n - 1
+    every = (n - 2) / (n_out - 2)
+    prev = 0
+    for i in range(n_out - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_start = end
+        next_end = min(int((i + 2) * every) + 1, n)
+        if next_end <= next_start:
+            next_start = n - 1
+            next_end = n
+        # 下一个桶的均值点（只统计横纵坐标都有效的点）
+        next_x = x[next_start:next_end]
+        next_y = values[next_start:next_end]
+        valid = ~(np.isnan(next_x) | np.isnan(next_y))
+        if valid.any():
+            avg_x = next_x[valid].mean()
+            avg_y = next_y[valid].mean()
+        else:
+            avg_x = np.nan
+            avg_y = np.nan
+        
+        prev_x = x[prev]
+        prev_y = values[prev]
+        areas = np.abs((prev_x - avg_x) * (values[start:end] - prev_y)
+                       - (prev_x - x[start:end]) * (avg_y - prev_y))
+        areas[np.isnan(areas)] = -1.0
+        prev = start + int(np.argmax(areas))
+        out[i + 1] = prev
+    return out
+
+
+# SimHash 的 3 字符分片哈希与混合常数（splitmix64）
+_SHINGLE_P1 = np.uint64(0x9E3779B97F4A7C15)
+_SHINGLE_P2 = np.uint64(0xC2B2AE3D27D4EB4F)
+_MIX_M1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_M2 = np.uint64(0x94D049BB133111EB)
+_SHIFT_27 = np.uint64(27)
+_SHIFT_30 = np.uint64(30)
+_SHIFT_31 = np.uint64(31)
+_BIT_SHIFTS = np.arange(64, dtype=np.uint64)
+_BIT_VALUES = np.uint64(1) << _BIT_SHIFTS
+
+
+def _simhash64_numpy(codes):
+    """
+    NumPy实现的SimHash签名（numba不可用时使用）
+    
+    Args:
+        codes: 字符码点数组（uint64）
+        
+    Returns:
+        64位签名
+    """
+    if codes.size >= 3:
+        hashes = (codes[:-2] * _SHINGLE_P1) ^ (codes[1:-1] * _SHINGLE_P2) ^ codes[2:]
+    else:
+        hashes = codes[:1] * _SHINGLE_P1
+    hashes = hashes ^ (hashes >> _SHIFT_30)
+    hashes = hashes * _MIX_M1
+    hashes = hashes ^ (hashes >> _SHIFT_27)
+    hashes = hashes * _MIX_M2
+    hashes = hashes ^ (hashes >> _SHIFT_31)
+    # 每一位按多数表决：超过一半的分片该位为1则签名该位为1
+    bits = (hashes[:, None] >> _BIT_SHIFTS) & np.uint64(1)
+    majority = bits.sum(axis=0) * 2 > hashes.size
+    return np.bitwise_or.reduce(_BIT_VALUES[majority])
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def simhash64(codes):
+        """
+        按3字符分片计算64位SimHash签名
+        
+        逐个分片哈希并累加各位计数，一个循环内完成，不生成 分片数×64 的位矩阵。
+        
+        Args:
+            codes: 字符码点数组（uint64）
+            
+        Returns:
+            64位签名（每一位按分片多数表决）
+        """
+        n = codes.size
+        if n >= 3:
+            m = n - 2
+        else:
+            m = min(n, 1)
+        counts = np.zeros(64, dtype=np.int64)
+        one = np.uint64(1)
+        for i in range(m):
+            if n >= 3:
+                h = (codes[i] * _SHINGLE_P1) ^ (codes[i + 1] * _SHINGLE_P2) ^ codes[i + 2]
+            else:
+                h = codes[0] * _SHINGLE_P1
+            h = h ^ (h >> _SHIFT_30)
+            h = h * _MIX_M1
+            h = h ^ (h >> _SHIFT_27)
+            h = h * _MIX_M2
+            h = h ^ (h >> _SHIFT_31)
+            for b in range(64):
+                if (h >> np.uint64(b)) & one:
+                    counts[b] += 1
+        signature = np.uint64(0)
+        for b in range(64):
+            if counts[b] * 2 > m:
+                signature |= one << np.uint64(b)
+        return signature
+else:
+    simhash64 = _simhash64_numpy
+
+
+def _warmup():
+    """预热JIT编译，避免首个请求承担编译延迟"""
+    if not NUMBA_AVAILABLE:
+        return
+    try:
+        zscore_anomalies(np.array([0.0, 1.0, 2.0]), 3.0)
+        nan_summary(np.array([0.0, 1.0, 2.0]))
+        lttb_indices(np.arange(5.0), np.array([0.0, 1.0, 2.0, 1.0, 0.0]), 3)
+        simhash64(np.array([1, 2, 3], dtype=np.uint64))
+    except Exception as e:
+        logger.warning(f"numba内核预热失败: {e}")
+
+
+_warmup()
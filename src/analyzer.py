@@ -5,10 +5,10 @@
 
 from typing import Dict, List, Optional, Iterator
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from .data_loader import TemperatureDataLoader
 from .db_data_loader import DatabaseDataLoader
 from .data_processor import TemperatureDataProcessor
-from .llm_service import LLMService
 
 
 class TemperatureAnalyzer:
@@ -23,7 +23,10 @@ class TemperatureAnalyzer:
                  openai_base_url: Optional[str] = None,
                  openai_no_think: bool = False,
                  n_ctx: int = 2048,
-                 n_threads: int = 4):
+                 n_threads: Optional[int] = None,
+                 n_gpu_layers: Optional[int] = None,
+                 n_contexts: int = 1,
+                 preferred_quant: Optional[str] = "Q4_K_M"):
         """
         初始化分析服务
         
@@ -37,7 +40,10 @@ class TemperatureAnalyzer:
             openai_base_url: OpenAI API基础URL（可选）
             openai_no_think: 是否启用非思考模式（性能优化），响应时间可从10秒降至1秒左右
             n_ctx: 本地模型上下文窗口大小
-            n_threads: 本地模型线程数
+            n_threads: 本地模型线程数，None表示按CPU核心数自动设置
+            n_gpu_layers: 本地模型卸载到GPU的层数，None表示自动
+            n_contexts: 本地模型上下文数量（可同时处理的分析请求数）
+            preferred_quant: 本地模型优先使用的量化版本，None表示按原路径加载
         """
         # 初始化数据模块
         if use_database:
@@ -47,12 +53,16 @@ class TemperatureAnalyzer:
         
         self.data_processor = TemperatureDataProcessor(self.data_loader)
         
-        # 初始化LLM服务
-        self.llm_service = LLMService(
+        # LLM服务延迟到首次使用时再初始化（避免仅查询数据时加载模型/SDK）
+        self._llm_service = None
+        self._llm_kwargs = dict(
             model_type=model_type,
             model_path=model_path,
             n_ctx=n_ctx,
             n_threads=n_threads,
+            n_gpu_layers=n_gpu_layers,
+            n_contexts=n_contexts,
+            preferred_quant=preferred_quant,
             openai_api_key=openai_api_key,
             openai_model=openai_model,
             openai_base_url=openai_base_url,
@@ -62,6 +72,14 @@ class TemperatureAnalyzer:
         # 加载数据
         self.data_loader.load_data()
     
+    @property
+    def llm_service(self):
+        """LLM服务（首次访问时导入并初始化）"""
+        if self._llm_service is None:
+            from .llm_service import LLMService
+            self._llm_service = LLMService(**self._llm_kwargs)
+        return self._llm_service
+    
     def get_device_list(self) -> List[Dict]:
         """
         获取所有设备列表
@@ -70,13 +88,19 @@ class TemperatureAnalyzer:
             设备列表
         """
         devices = self.data_loader.get_all_devices()
+        
+        # 数据库模式：一次查询取回所有设备的统计信息，避免逐设备查询
+        bulk_stats = None
+        if hasattr(self.data_loader, 'get_statistics_bulk'):
+            bulk_stats = self.data_loader.get_statistics_bulk(
+                [d.get('device_id') for d in devices]
+            )
+        
         result = []
         for d in devices:
-            # 对于数据库模式，需要单独获取读数数量
-            if hasattr(self.data_loader, 'db'):
+            if bulk_stats is not None:
                 # 数据库模式
-                stats = self.data_loader.get_statistics(d.get('device_id'))
-                readings_count = stats.get('total_readings', 0)
+                readings_count = bulk_stats.get(d.get('device_id'), {}).get('total_readings', 0)
             else:
                 # JSON文件模式
                 readings_count = len(d.get('readings', []))
@@ -155,17 +179,21 @@ class TemperatureAnalyzer:
         Returns:
             所有设备的分析结果
         """
-        devices = self.get_device_list()
-        all_stats = self.data_loader.get_statistics()
-        
         # 准备所有设备的数据摘要
         all_data_summary = self.data_processor.prepare_for_llm()
-        
-        # LLM综合分析
-        llm_analysis = self.llm_service.analyze_temperature_data(
-            all_data_summary,
-            "comprehensive"
-        )
+        llm_service = self.llm_service
+        
+        # LLM综合分析在后台线程中进行（等待模型期间不占用GIL），
+        # 同时在当前线程查询设备列表和整体统计；后台线程不访问数据加载器
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            llm_future = executor.submit(
+                llm_service.analyze_temperature_data,
+                all_data_summary,
+                "comprehensive"
+            )
+            devices = self.get_device_list()
+            all_stats = self.data_loader.get_statistics()
+            llm_analysis = llm_future.result()
         
         return {
             'devices': devices,
@@ -196,22 +224,7 @@ class TemperatureAnalyzer:
         Returns:
             图表数据字典
         """
-        df = self.data_processor.to_dataframe(device_id)
-        
-        if df.empty:
-            return {
-                'timestamps': [],
-                'temperatures': [],
-                'humidity': [],
-                'status': []
-            }
-        
-        return {
-            'timestamps': df['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S').tolist(),
-            'temperatures': df['temperature'].tolist(),
-            'humidity': df['humidity'].tolist() if 'humidity' in df.columns else [],
-            'status': df['status'].tolist() if 'status' in df.columns else []
-        }
+        return self.data_processor.get_chart_data(device_id)
     
     def analyze_device_stream(self, device_id: str, 
                               analysis_type: str = "comprehensive",
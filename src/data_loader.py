@@ -1,8 +1,64 @@
-import json
 import os
+import mmap
 from datetime import datetime
 from typing import List, Dict, Optional
 from pathlib import Path
+import numpy as np
+from ._kernels import nan_summary
+
+# 优先使用orjson加速JSON解析，未安装时回退到标准库
+try:
+    import orjson
+    _json_loads = orjson.loads
+    _MMAP_PARSE = True  # orjson可直接解析内存映射，无需先复制整个文件
+except ImportError:
+    import json
+    _json_loads = json.loads
+    _MMAP_PARSE = False
+
+
+def _load_json_file(path: Path):
+    """
+    读取并解析JSON文件
+    
+    使用orjson时通过mmap直接解析文件映射，避免额外持有一份文件大小的bytes副本。
+    
+    Args:
+        path: JSON文件路径
+        
+    Returns:
+        解析后的对象
+    """
+    with open(path, 'rb') as f:
+        if _MMAP_PARSE and os.fstat(f.fileno()).st_size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with memoryview(mm) as view:
+                    return _json_loads(view)
+        return _json_loads(f.read())
+
+
+def _readings_to_columns(readings: List[Dict]) -> Dict[str, np.ndarray]:
+    """
+    将读数列表（行式）转换为按列存储的NumPy数组（列式）
+    
+    Args:
+        readings: 读数列表
+        
+    Returns:
+        列名 -> 数组 的字典；数值列为float64（缺失值为NaN），其余为字符串数组
+    """
+    columns = {}
+    if any('timestamp' in r for r in readings):
+        columns['timestamp'] = np.array([r.get('timestamp') or '' for r in readings], dtype=str)
+    for key in ('temperature', 'humidity'):
+        if any(key in r for r in readings):
+            columns[key] = np.fromiter(
+                (np.nan if r.get(key) is None else r[key] for r in readings),
+                dtype=np.float64, count=len(readings)
+            )
+    if any('status' in r for r in readings):
+        columns['status'] = np.array([r.get('status') or '' for r in readings], dtype=str)
+    return columns
 
 
 class TemperatureDataLoader:
@@ -17,6 +73,13 @@ class TemperatureDataLoader:
         """
         self.data_file = Path(data_file)
         self.data = None
+        # 设备索引与统计缓存（随数据文件修改时间失效）
+        self._device_index: Dict[str, Dict] = {}
+        self._stats_cache: Dict[tuple, Dict] = {}
+        self._columns_cache: Dict[str, Dict[str, np.ndarray]] = {}
+        self._aggregates_cache: Dict[str, Dict] = {}
+        self._timestamps_sorted: Dict[str, bool] = {}
+        self._data_mtime_ns: Optional[int] = None
         
     def load_data(self) -> Dict:
         """
@@ -28,11 +91,33 @@ class TemperatureDataLoader:
         if not self.data_file.exists():
             raise FileNotFoundError(f"数据文件不存在: {self.data_file}")
         
-        with open(self.data_file, 'r', encoding='utf-8') as f:
-            self.data = json.load(f)
+        mtime_ns = self.data_file.stat().st_mtime_ns
+        self.data = _load_json_file(self.data_file)
+        
+        # 构建 device_id -> device 索引，避免每次线性扫描
+        self._device_index = {
+            d.get('device_id'): d for d in self.data.get('devices', [])
+        }
+        self._stats_cache = {}
+        self._columns_cache = {}
+        self._aggregates_cache = {}
+        self._timestamps_sorted = {}
+        self._data_mtime_ns = mtime_ns
         
         return self.data
     
+    def _ensure_loaded(self):
+        """确保数据已加载，数据文件被修改后自动重新加载"""
+        if self.data is None:
+            self.load_data()
+            return
+        try:
+            mtime_ns = self.data_file.stat().st_mtime_ns
+        except OSError:
+            return
+        if mtime_ns != self._data_mtime_ns:
+            self.load_data()
+    
     def get_all_devices(self) -> List[Dict]:
         """
         获取所有设备信息
@@ -40,8 +125,7 @@ class TemperatureDataLoader:
         Returns:
             设备列表
         """
-        if self.data is None:
-            self.load_data()
+        self._ensure_loaded()
         return self.data.get('devices', [])
     
     def get_device_by_id(self, device_id: str) -> Optional[Dict]:
@@ -54,11 +138,8 @@ class TemperatureDataLoader:
         Returns:
             设备数据字典，如果不存在返回None
         """
-        devices = self.get_all_devices()
-        for device in devices:
-            if device.get('device_id') == device_id:
-                return device
-        return None
+        self._ensure_loaded()
+        return self._device_index.get(device_id)
     
     def get_device_readings(self, device_id: str, 
                            start_time: Optional[str] = None,
@@ -82,6 +163,11 @@ class TemperatureDataLoader:
         
         # 时间过滤
         if start_time or end_time:
+            # 读数按时间有序时，二分查找直接切片
+            time_slice = self._time_slice(device_id, start_time, end_time)
+            if time_slice is not None:
+                return readings[time_slice]
+            
             filtered_readings = []
             for reading in readings:
                 timestamp = reading.get('timestamp')
@@ -94,6 +180,75 @@ class TemperatureDataLoader:
         
         return readings
     
+    def _time_slice(self, device_id: str,
+                    start_time: Optional[str],
+                    end_time: Optional[str]) -> Optional[slice]:
+        """
+        在有序时间戳上二分查找时间窗口
+        
+        Args:
+            device_id: 设备ID
+            start_time: 开始时间 (ISO格式字符串)
+            end_time: 结束时间 (ISO格式字符串)
+            
+        Returns:
+            读数下标切片；时间戳无序或缺失时返回None
+        """
+        columns = self.get_device_columns(device_id)
+        if not self._timestamps_sorted.get(device_id):
+            return None
+        
+        timestamps = columns['timestamp']
+        lo = int(np.searchsorted(timestamps, start_time, side='left')) if start_time else 0
+        hi = int(np.searchsorted(timestamps, end_time, side='right')) if end_time else len(timestamps)
+        return slice(lo, hi)
+    
+    def get_device_columns(self, device_id: str,
+                           start_time: Optional[str] = None,
+                           end_time: Optional[str] = None) -> Dict[str, np.ndarray]:
+        """
+        获取指定设备读数的列式数组（缓存，随数据重新加载失效）
+        
+        Args:
+            device_id: 设备ID
+            start_time: 开始时间 (ISO格式字符串)
+            end_time: 结束时间 (ISO格式字符串)
+            
+        Returns:
+            列名 -> NumPy数组 的字典，设备不存在时返回空字典
+        """
+        self._ensure_loaded()
+        columns = self._columns_cache.get(device_id)
+        if columns is None:
+            device = self.get_device_by_id(device_id)
+            if device is None:
+                return {}
+            readings = device.get('readings', [])
+            columns = _readings_to_columns(readings)
+            self._columns_cache[device_id] = columns
+            timestamps = columns.get('timestamp')
+            self._timestamps_sorted[device_id] = (
+                timestamps is not None
+                and all(r.get('timestamp') for r in readings)
+                and bool(np.all(timestamps[:-1] <= timestamps[1:]))
+            )
+        
+        # 时间过滤（有序时二分切片，否则向量化比较ISO时间字符串）
+        if (start_time or end_time) and 'timestamp' in columns:
+            time_slice = self._time_slice(device_id, start_time, end_time)
+            if time_slice is not None:
+                return {name: values[time_slice] for name, values in columns.items()}
+            
+            timestamps = columns['timestamp']
+            mask = np.ones(len(timestamps), dtype=bool)
+            if start_time:
+                mask &= timestamps >= start_time
+            if end_time:
+                mask &= timestamps <= end_time
+            return {name: values[mask] for name, values in columns.items()}
+        
+        return columns
+    
     def get_latest_reading(self, device_id: str) -> Optional[Dict]:
         """
         获取设备最新读数
@@ -109,16 +264,24 @@ class TemperatureDataLoader:
             return None
         return readings[-1]
     
-    def get_all_readings(self) -> List[Dict]:
+    def get_all_readings(self, start_time: Optional[str] = None,
+                         end_time: Optional[str] = None) -> List[Dict]:
         """
         获取所有设备的所有读数（扁平化）
         
+        Args:
+            start_time: 开始时间 (ISO格式字符串)
+            end_time: 结束时间 (ISO格式字符串)
+            
         Returns:
             包含设备信息的读数列表
         """
         all_readings = []
         for device in self.get_all_devices():
-            for reading in device.get('readings', []):
+            readings = device.get('readings', [])
+            if start_time or end_time:
+                readings = self.get_device_readings(device.get('device_id'), start_time, end_time)
+            for reading in readings:
                 reading_with_device = {
                     **reading,
                     'device_id': device.get('device_id'),
@@ -128,46 +291,184 @@ class TemperatureDataLoader:
                 all_readings.append(reading_with_device)
         return all_readings
     
-    def get_statistics(self, device_id: Optional[str] = None) -> Dict:
+    def get_all_columns(self, start_time: Optional[str] = None,
+                        end_time: Optional[str] = None) -> Dict[str, np.ndarray]:
         """
-        获取统计信息
+        获取所有设备读数的列式数组（扁平化，不逐行构建字典）
+        
+        Args:
+            start_time: 开始时间 (ISO格式字符串)
+            end_time: 结束时间 (ISO格式字符串)
+            
+        Returns:
+            列名 -> NumPy数组 的字典，包含 device_id/device_name/location 列
+        """
+        devices = self.get_all_devices()
+        parts = [self.get_device_columns(d.get('device_id'), start_time, end_time) for d in devices]
+        lengths = [len(next(iter(c.values()))) if c else 0 for c in parts]
+        if not sum(lengths):
+            return {}
+        
+        names = []
+        for c in parts:
+            names.extend(name for name in c if name not in names)
+        
+        columns = {}
+        for name in names:
+            numeric = name in ('temperature', 'humidity')
+            columns[name] = np.concatenate([
+                c[name] if name in c
+                else np.full(n, np.nan) if numeric else np.full(n, '', dtype=str)
+                for c, n in zip(parts, lengths)
+            ])
+        
+        # 设备信息按读数数量重复展开，避免每条读数复制一次字典
+        for key in ('device_id', 'device_name', 'location'):
+            columns[key] = np.repeat(
+                np.array([d.get(key) or '' for d in devices], dtype=str), lengths
+            )
+        return columns
+    
+    def get_data_version(self, device_id: Optional[str] = None):
+        """
+        获取数据版本标识（数据文件修改时间），用于上层缓存失效判断
+        
+        Args:
+            device_id: 设备ID（JSON模式下整个文件共享一个版本）
+            
+        Returns:
+            数据版本标识
+        """
+        self._ensure_loaded()
+        return self._data_mtime_ns
+    
+    def get_statistics(self, device_id: Optional[str] = None,
+                       start_time: Optional[str] = None,
+                       end_time: Optional[str] = None) -> Dict:
+        """
+        获取统计信息（按设备ID、时间范围和数据文件修改时间缓存）
         
         Args:
             device_id: 设备ID，如果为None则统计所有设备
+            start_time: 开始时间 (ISO格式字符串)
+            end_time: 结束时间 (ISO格式字符串)
+            
+        Returns:
+            统计信息字典
+        """
+        self._ensure_loaded()
+        cache_key = (device_id, start_time, end_time, self._data_mtime_ns)
+        stats = self._stats_cache.get(cache_key)
+        if stats is None:
+            stats = self._compute_statistics(device_id, start_time, end_time)
+            self._stats_cache[cache_key] = stats
+        return dict(stats)
+    
+    def _compute_statistics(self, device_id: Optional[str] = None,
+                            start_time: Optional[str] = None,
+                            end_time: Optional[str] = None) -> Dict:
+        """
+        计算统计信息
+        
+        Args:
+            device_id: 设备ID，如果为None则统计所有设备
+            start_time: 开始时间 (ISO格式字符串)
+            end_time: 结束时间 (ISO格式字符串)
             
         Returns:
             统计信息字典
         """
         if device_id:
-            readings = self.get_device_readings(device_id)
             device = self.get_device_by_id(device_id)
             if device is None:
                 return {}
             device_name = device.get('device_name')
+            devices = [device]
         else:
-            readings = self.get_all_readings()
             device_name = "所有设备"
+            devices = self.get_all_devices()
         
-        if not readings:
+        # 合并各设备的聚合量（计数、求和、极值），无需拼接全部读数
+        aggregates = [self._device_aggregate(d.get('device_id'), start_time, end_time)
+                      for d in devices]
+        total_readings = sum(a['count'] for a in aggregates)
+        if not total_readings:
             return {}
         
-        temperatures = [r.get('temperature') for r in readings if r.get('temperature')]
+        temp_count = sum(a['temp_count'] for a in aggregates)
+        has_temps = temp_count > 0
+        if has_temps:
+            temp_min = min(a['temp_min'] for a in aggregates if a['temp_count'])
+            temp_max = max(a['temp_max'] for a in aggregates if a['temp_count'])
         
         stats = {
             'device_name': device_name,
-            'total_readings': len(readings),
-            'avg_temperature': sum(temperatures) / len(temperatures) if temperatures else 0,
-            'min_temperature': min(temperatures) if temperatures else 0,
-            'max_temperature': max(temperatures) if temperatures else 0,
-            'temperature_range': max(temperatures) - min(temperatures) if temperatures else 0,
-            'alert_count': sum(1 for r in readings if r.get('status') == 'alert'),
-            'warning_count': sum(1 for r in readings if r.get('status') == 'warning'),
-            'normal_count': sum(1 for r in readings if r.get('status') == 'normal')
+            'total_readings': total_readings,
+            'avg_temperature': sum(a['temp_sum'] for a in aggregates) / temp_count if has_temps else 0,
+            'min_temperature': temp_min if has_temps else 0,
+            'max_temperature': temp_max if has_temps else 0,
+            'temperature_range': temp_max - temp_min if has_temps else 0,
+            'alert_count': sum(a['alert_count'] for a in aggregates),
+            'warning_count': sum(a['warning_count'] for a in aggregates),
+            'normal_count': sum(a['normal_count'] for a in aggregates)
         }
         
         return stats
     
+    def _device_aggregate(self, device_id: str,
+                          start_time: Optional[str] = None,
+                          end_time: Optional[str] = None) -> Dict:
+        """
+        获取单个设备的可合并聚合量（全量结果缓存，随数据重新加载失效）
+        
+        Args:
+            device_id: 设备ID
+            start_time: 开始时间 (ISO格式字符串)
+            end_time: 结束时间 (ISO格式字符串)
+            
+        Returns:
+            包含读数数量、温度计数/求和/极值和各状态计数的字典
+        """
+        ranged = bool(start_time or end_time)
+        if not ranged:
+            aggregate = self._aggregates_cache.get(device_id)
+            if aggregate is not None:
+                return aggregate
+        
+        columns = self.get_device_columns(device_id, start_time, end_time)
+        
+        # 温度的个数/求和/极值在单次遍历中完成，状态计数在列式数组上向量化比较
+        temp_count, temp_sum, temp_min, temp_max = nan_summary(
+            columns.get('temperature', np.empty(0)))
+        statuses = columns.get('status', np.empty(0, dtype=str))
+        
+        if ranged:
+            count = len(columns.get('timestamp', ()))
+        else:
+            device = self.get_device_by_id(device_id)
+            count = len(device.get('readings', [])) if device else 0
+        
+        aggregate = {
+            'count': count,
+            'temp_count': int(temp_count),
+            'temp_sum': float(temp_sum),
+            'temp_min': float(temp_min),
+            'temp_max': float(temp_max),
+            'alert_count': int((statuses == 'alert').sum()),
+            'warning_count': int((statuses == 'warning').sum()),
+            'normal_count': int((statuses == 'normal').sum())
+        }
+        if not ranged:
+            self._aggregates_cache[device_id] = aggregate
+        return aggregate
+    
     def clear_cache(self):
         """清除数据缓存（用于强制刷新）"""
         self.data = None
+        self._device_index = {}
+        self._stats_cache = {}
+        self._columns_cache = {}
+        self._aggregates_cache = {}
+        self._timestamps_sorted = {}
+        self._data_mtime_ns = None
 
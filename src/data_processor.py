@@ -1,6 +1,9 @@
+from collections import OrderedDict
 from typing import List, Dict, Union, Optional
 from datetime import datetime
+import numpy as np
 import pandas as pd
+from ._kernels import zscore_anomalies
 from .data_loader import TemperatureDataLoader
 from .db_data_loader import DatabaseDataLoader
 
@@ -16,12 +19,27 @@ class TemperatureDataProcessor:
             data_loader: 数据加载器实例（支持JSON或数据库模式）
         """
         self.data_loader = data_loader
+        # LLM数据摘要缓存：(设备ID, 开始时间, 结束时间, 数据版本) -> 摘要
+        self._summary_cache = OrderedDict()
+        self._summary_cache_size = 256
+        # DataFrame缓存：(设备ID, 开始时间, 结束时间, 数据版本) -> DataFrame
+        # 只缓存行数较多、重建代价高的结果，读取时返回副本
+        self._frame_cache = OrderedDict()
+        self._frame_cache_size = 32
+        self._frame_cache_min_rows = 1000
+    
+    def clear_cache(self):
+        """清除处理器缓存及数据加载器缓存（用于强制刷新）"""
+        self._summary_cache.clear()
+        self._frame_cache.clear()
+        if hasattr(self.data_loader, 'clear_cache'):
+            self.data_loader.clear_cache()
     
     def to_dataframe(self, device_id: str = None, 
                      start_time: Optional[str] = None,
                      end_time: Optional[str] = None) -> pd.DataFrame:
         """
-        将数据转换为Pandas DataFrame
+        将数据转换为Pandas DataFrame（大结果按数据版本缓存）
         
         Args:
             device_id: 设备ID，如果为None则包含所有设备
@@ -31,40 +49,158 @@ class TemperatureDataProcessor:
         Returns:
             DataFrame
         """
-        if device_id:
-            readings = self.data_loader.get_device_readings(device_id, start_time, end_time)
+        # 数据版本变化（文件更新，或数据库模式下有新读数、手动刷新）时缓存键随之变化，
+        # 旧条目自然失效；版本为None表示数据源不允许缓存
+        version = self.data_loader.get_data_version(device_id)
+        if version is None:
+            return self._build_dataframe(device_id, start_time, end_time)
+        cache_key = (device_id, start_time, end_time, version)
+        df = self._frame_cache.get(cache_key)
+        if df is not None:
+            self._frame_cache.move_to_end(cache_key)
+            return df.copy()
+        
+        df = self._build_dataframe(device_id, start_time, end_time)
+        if len(df) >= self._frame_cache_min_rows:
+            self._frame_cache[cache_key] = df
+            if len(self._frame_cache) > self._frame_cache_size:
+                self._frame_cache.popitem(last=False)
+            return df.copy()
+        return df
+    
+    def _build_dataframe(self, device_id: Optional[str],
+                         start_time: Optional[str],
+                         end_time: Optional[str]) -> pd.DataFrame:
+        """
+        构建DataFrame（无缓存）
+        
+        Args:
+            device_id: 设备ID，如果为None则包含所有设备
+            start_time: 开始时间 (ISO格式字符串)
+            end_time: 结束时间 (ISO格式字符串)
+            
+        Returns:
+            DataFrame
+        """
+        if device_id and hasattr(self.data_loader, 'get_readings_df'):
+            # 数据库模式：查询结果直接按列构建DataFrame（设备不存在时JOIN结果为空），
+            # 无需先经 get_device_by_id 拉取字典形式的读数
+            df = self.data_loader.get_readings_df(device_id, start_time, end_time)
+            return df if not df.empty else pd.DataFrame()
+        elif device_id:
             device = self.data_loader.get_device_by_id(device_id)
             if device is None:
                 return pd.DataFrame()
-            df = pd.DataFrame(readings)
+            if hasattr(self.data_loader, 'get_device_columns'):
+                # JSON模式：直接由列式数组构建，避免逐行解析字典
+                df = pd.DataFrame(self.data_loader.get_device_columns(device_id, start_time, end_time))
+            else:
+                readings = self.data_loader.get_device_readings(device_id, start_time, end_time)
+                df = pd.DataFrame(readings)
             df['device_id'] = device.get('device_id')
             df['device_name'] = device.get('device_name')
             df['location'] = device.get('location')
+        elif hasattr(self.data_loader, 'get_all_columns'):
+            # JSON模式：由列式数组拼接，时间过滤在列上完成
+            df = pd.DataFrame(self.data_loader.get_all_columns(start_time, end_time))
+        elif hasattr(self.data_loader, 'get_readings_df'):
+            # 数据库模式：单次查询直接按列构建DataFrame
+            return self.data_loader.get_readings_df(None, start_time, end_time)
         else:
-            # 对于所有设备，需要手动过滤时间范围
-            readings = self.data_loader.get_all_readings()
+            # 时间范围过滤由数据加载器完成（数据库模式下在SQL中过滤）
+            readings = self.data_loader.get_all_readings(start_time, end_time)
             df = pd.DataFrame(readings)
-            
-            # 如果指定了时间范围，进行过滤
-            if (start_time or end_time) and not df.empty and 'timestamp' in df.columns:
-                df['timestamp'] = pd.to_datetime(df['timestamp'])
-                if start_time:
-                    start_dt = pd.to_datetime(start_time)
-                    df = df[df['timestamp'] >= start_dt]
-                if end_time:
-                    end_dt = pd.to_datetime(end_time)
-                    df = df[df['timestamp'] <= end_dt]
-        
-        # 转换时间戳
+        
+        # 转换时间戳：时间过滤已由数据加载器完成，这里只解析一次；
+        # 显式ISO8601格式跳过逐值格式推断，已有序时不再排序
         if 'timestamp' in df.columns and not df.empty:
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df = df.sort_values('timestamp')
+            df['timestamp'] = pd.to_datetime(df['timestamp'], format='ISO8601', cache=True)
+            if not df['timestamp'].is_monotonic_increasing:
+                df = df.sort_values('timestamp', kind='stable')
         
         return df
     
+    def get_chart_data(self, device_id: str) -> Dict[str, np.ndarray]:
+        """
+        获取图表所需的列数据（按时间排序）
+        
+        JSON模式下直接读取列式数组，不构建DataFrame。时间戳以datetime64[s]数组返回，
+        数值列以float64数组返回（缺失值为NaN），Plotly序列化时无需逐个转换元素。
+        返回的数组可能与缓存共享，调用方不应原地修改。
+        
+        Args:
+            device_id: 设备ID
+            
+        Returns:
+            包含 timestamps/temperatures/humidity/status 数组的字典（无数据时为空数组）
+        """
+        if not hasattr(self.data_loader, 'get_device_columns'):
+            df = self.to_dataframe(device_id)
+            if df.empty:
+                return self._empty_chart_data()
+            return {
+                'timestamps': self._chart_timestamps(pd.DatetimeIndex(df['timestamp'])),
+                'temperatures': df['temperature'].to_numpy(dtype=np.float64),
+                'humidity': (df['humidity'].to_numpy(dtype=np.float64)
+                             if 'humidity' in df.columns else np.empty(0)),
+                'status': (df['status'].to_numpy(dtype=object)
+                           if 'status' in df.columns else np.empty(0, dtype=object))
+            }
+        
+        columns = self.data_loader.get_device_columns(device_id)
+        if 'timestamp' not in columns or len(columns['timestamp']) == 0:
+            return self._empty_chart_data()
+        
+        timestamps = pd.to_datetime(columns['timestamp'], format='ISO8601', cache=True)
+        order = None
+        if not timestamps.is_monotonic_increasing:
+            order = np.argsort(timestamps.values, kind='stable')
+            timestamps = timestamps[order]
+        
+        def column_array(name: str, empty: np.ndarray) -> np.ndarray:
+            values = columns.get(name)
+            if values is None:
+                return empty
+            return values if order is None else values[order]
+        
+        return {
+            'timestamps': self._chart_timestamps(timestamps),
+            'temperatures': column_array('temperature', np.empty(0)),
+            'humidity': column_array('humidity', np.empty(0)),
+            'status': column_array('status', np.empty(0, dtype=object))
+        }
+    
+    @staticmethod
+    def _chart_timestamps(timestamps: pd.DatetimeIndex) -> np.ndarray:
+        """
+        把时间戳转换为秒精度的datetime64数组（带时区时保留本地时间）
+        
+        不再格式化为字符串：图表端按时间计算降采样和窗口时可直接使用，无需重新解析。
+        
+        Args:
+            timestamps: 解析后的时间戳
+            
+        Returns:
+            datetime64[s] 数组
+        """
+        if timestamps.tz is not None:
+            timestamps = timestamps.tz_localize(None)
+        return timestamps.to_numpy(dtype='datetime64[s]')
+    
+    @staticmethod
+    def _empty_chart_data() -> Dict[str, np.ndarray]:
+        """无数据时的图表列数据"""
+        return {
+            'timestamps': np.empty(0, dtype='datetime64[s]'),
+            'temperatures': np.empty(0),
+            'humidity': np.empty(0),
+            'status': np.empty(0, dtype=object)
+        }
+    
     def detect_anomalies(self, device_id: str, threshold: float = 3.0,
                          start_time: Optional[str] = None,
-                         end_time: Optional[str] = None) -> List[Dict]:
+                         end_time: Optional[str] = None,
+                         df: Optional[pd.DataFrame] = None) -> List[Dict]:
         """
         检测异常温度值（使用标准差方法）
         
@@ -73,38 +209,52 @@ class TemperatureDataProcessor:
             threshold: 标准差倍数阈值
             start_time: 开始时间 (ISO格式字符串)
             end_time: 结束时间 (ISO格式字符串)
+            df: 已构建好的该设备DataFrame，提供时不再重新获取数据
             
         Returns:
             异常读数列表
         """
-        df = self.to_dataframe(device_id, start_time, end_time)
+        if df is None:
+            df = self.to_dataframe(device_id, start_time, end_time)
         
         if df.empty or 'temperature' not in df.columns:
             return []
         
-        mean_temp = df['temperature'].mean()
-        std_temp = df['temperature'].std()
+        temps = df['temperature'].to_numpy(dtype=np.float64)
+        idx, z_scores, mean_temp = zscore_anomalies(temps, float(threshold))
         
-        if std_temp == 0:
+        if idx.size == 0:
             return []
         
-        anomalies = []
-        for idx, row in df.iterrows():
-            temp = row['temperature']
-            z_score = abs((temp - mean_temp) / std_temp)
-            
-            if z_score > threshold:
-                timestamp_str = row['timestamp'].isoformat() if hasattr(row['timestamp'], 'isoformat') else str(row['timestamp'])
-                anomalies.append({
-                    'timestamp': timestamp_str,
-                    'temperature': float(temp),
-                    'z_score': round(z_score, 2),
-                    'device_id': device_id,
-                    'device_name': row.get('device_name', ''),
-                    'anomaly_type': 'high' if temp > mean_temp else 'low'
-                })
-        
-        return anomalies
+        # 只对异常行做一次切片，各列整体转换后再拼装结果
+        anomaly_df = df.iloc[idx]
+        anomaly_temps = temps[idx]
+        timestamps = anomaly_df['timestamp']
+        if pd.api.types.is_datetime64_any_dtype(timestamps):
+            # 与逐行 isoformat() 输出一致（保留微秒和时区）
+            timestamps = timestamps.map(lambda ts: ts.isoformat())
+        device_names = anomaly_df['device_name'] if 'device_name' in anomaly_df.columns \
+            else [''] * len(idx)
+        anomaly_types = np.where(anomaly_temps > mean_temp, 'high', 'low')
+        z_values = np.round(z_scores[idx], 2)
+        
+        return [
+            {
+                'timestamp': str(timestamp),
+                'temperature': temp,
+                'z_score': z_score,
+                'device_id': device_id,
+                'device_name': device_name,
+                'anomaly_type': anomaly_type
+            }
+            for timestamp, temp, z_score, device_name, anomaly_type in zip(
+                timestamps.tolist(),
+                anomaly_temps.tolist(),
+                z_values.tolist(),
+                list(device_names),
+                anomaly_types.tolist()
+            )
+        ]
     
     def get_trend_analysis(self, device_id: str, window_size: int = 5) -> Dict:
         """
@@ -122,25 +272,24 @@ class TemperatureDataProcessor:
         if df.empty or 'temperature' not in df.columns:
             return {}
         
-        # 计算移动平均
-        df['moving_avg'] = df['temperature'].rolling(window=window_size, min_periods=1).mean()
+        temperatures = df['temperature']
         
-        # 计算趋势方向
-        recent_temps = df['temperature'].tail(window_size).values
-        if len(recent_temps) >= 2:
-            trend = '上升' if recent_temps[-1] > recent_temps[0] else '下降'
-            trend_rate = (recent_temps[-1] - recent_temps[0]) / len(recent_temps)
+        # 计算趋势方向：取最近窗口首尾差的平均斜率（不生成未使用的移动平均列）
+        tail = temperatures.tail(window_size)
+        if len(tail) >= 2:
+            trend = '上升' if tail.iloc[-1] > tail.iloc[0] else '下降'
+            trend_rate = float(tail.iloc[-1] - tail.iloc[0]) / len(tail)
         else:
             trend = '稳定'
-            trend_rate = 0
+            trend_rate = 0.0
         
         return {
             'device_id': device_id,
             'trend': trend,
             'trend_rate': round(trend_rate, 2),
-            'current_temp': float(df['temperature'].iloc[-1]),
-            'avg_temp': float(df['temperature'].mean()),
-            'volatility': float(df['temperature'].std())
+            'current_temp': float(temperatures.iloc[-1]),
+            'avg_temp': float(temperatures.mean()),
+            'volatility': float(temperatures.std())
         }
     
     def prepare_for_llm(self, device_id: str = None,
@@ -157,28 +306,43 @@ class TemperatureDataProcessor:
         Returns:
             格式化的数据摘要字符串
         """
-        # 注意：get_statistics 可能不支持日期范围，这里先使用全部数据
-        stats = self.data_loader.get_statistics(device_id)
+        # 数据版本（JSON文件修改时间，或数据库模式下的最新读数时间）不变时摘要也不变
+        version = self.data_loader.get_data_version(device_id)
+        if version is None:
+            return self._build_llm_summary(device_id, start_time, end_time)
+        cache_key = (device_id, start_time, end_time, version)
+        summary = self._summary_cache.get(cache_key)
+        if summary is not None:
+            self._summary_cache.move_to_end(cache_key)
+            return summary
+        
+        summary = self._build_llm_summary(device_id, start_time, end_time)
+        self._summary_cache[cache_key] = summary
+        if len(self._summary_cache) > self._summary_cache_size:
+            self._summary_cache.popitem(last=False)
+        return summary
+    
+    def _build_llm_summary(self, device_id: Optional[str],
+                           start_time: Optional[str],
+                           end_time: Optional[str]) -> str:
+        """
+        构建用于LLM分析的数据摘要（无缓存）
+        
+        Args:
+            device_id: 设备ID，如果为None则包含所有设备
+            start_time: 开始时间 (ISO格式字符串)
+            end_time: 结束时间 (ISO格式字符串)
+            
+        Returns:
+            格式化的数据摘要字符串
+        """
+        # 统计量由数据加载器按时间范围直接聚合（数据库模式下在SQL中完成）
+        stats = self.data_loader.get_statistics(device_id, start_time, end_time)
         if not stats:
             return "无可用数据"
         
-        df = self.to_dataframe(device_id, start_time, end_time)
-        
-        # 如果指定了日期范围，重新计算统计信息
-        if (start_time or end_time) and not df.empty:
-            stats = {
-                'device_name': stats.get('device_name', 'N/A'),
-                'total_readings': len(df),
-                'avg_temperature': float(df['temperature'].mean()) if 'temperature' in df.columns else 0,
-                'min_temperature': float(df['temperature'].min()) if 'temperature' in df.columns else 0,
-                'max_temperature': float(df['temperature'].max()) if 'temperature' in df.columns else 0,
-                'temperature_range': float(df['temperature'].max() - df['temperature'].min()) if 'temperature' in df.columns else 0,
-                'normal_count': int((df['status'] == 'normal').sum()) if 'status' in df.columns else 0,
-                'warning_count': int((df['status'] == 'warning').sum()) if 'status' in df.columns else 0,
-                'alert_count': int((df['status'] == 'alert').sum()) if 'status' in df.columns else 0,
-            }
-        
-        summary = f"""
+        # 各部分先放入列表，最后一次拼接
+        parts = [f"""
 温度数据分析摘要：
 ==================
 设备名称: {stats.get('device_name', 'N/A')}
@@ -190,23 +354,28 @@ class TemperatureDataProcessor:
 正常状态: {stats.get('normal_count', 0)}次
 警告状态: {stats.get('warning_count', 0)}次
 告警状态: {stats.get('alert_count', 0)}次
-"""
+"""]
         
-        if not df.empty and device_id:
-            anomalies = self.detect_anomalies(device_id, start_time=start_time, end_time=end_time)
+        if device_id:
+            # DataFrame只构建一次并传给异常检测，避免重复查询
+            df = self.to_dataframe(device_id, start_time, end_time)
+            anomalies = self.detect_anomalies(device_id, start_time=start_time,
+                                              end_time=end_time, df=df)
             if anomalies:
-                summary += f"\n检测到异常: {len(anomalies)}次\n"
-                for anomaly in anomalies[:3]:  # 只显示前3个
-                    summary += f"  - {anomaly['timestamp']}: {anomaly['temperature']}°C ({anomaly['anomaly_type']})\n"
+                parts.append(f"\n检测到异常: {len(anomalies)}次\n")
+                parts.extend(
+                    f"  - {anomaly['timestamp']}: {anomaly['temperature']}°C ({anomaly['anomaly_type']})\n"
+                    for anomaly in anomalies[:3]  # 只显示前3个
+                )
         
         # 添加日期范围信息
         if start_time or end_time:
-            summary += f"\n日期范围: "
+            parts.append("\n日期范围: ")
             if start_time:
-                summary += f"从 {start_time.split('T')[0]} "
+                parts.append(f"从 {start_time.split('T')[0]} ")
             if end_time:
-                summary += f"到 {end_time.split('T')[0]}"
-            summary += "\n"
+                parts.append(f"到 {end_time.split('T')[0]}")
+            parts.append("\n")
         
-        return summary
+        return ''.join(parts)
 
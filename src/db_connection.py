@@ -1,17 +1,46 @@
 """
 数据库连接模块
-提供MySQL数据库连接功能
-支持自动重连和连接健康检查
+提供MySQL数据库连接功能（优先使用mysqlclient，未安装时使用pymysql）
+支持连接池（需安装DBUtils）、自动重连和连接健康检查
 """
 
-import pymysql
-from typing import Optional
+try:
+    # 优先使用C扩展驱动mysqlclient（结果行在C中解码），接口与pymysql兼容
+    import MySQLdb as mysql_driver
+    import MySQLdb.cursors
+except ImportError:
+    import pymysql as mysql_driver
+import pandas as pd
+from contextlib import contextmanager
+from typing import Optional, Iterator, Callable, Any
 import logging
+import threading
 import time
 
+try:
+    from dbutils.pooled_db import PooledDB
+    POOL_AVAILABLE = True
+except ImportError:
+    PooledDB = None
+    POOL_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 
+def _rows_to_df(cursor) -> pd.DataFrame:
+    """
+    将元组游标的全部结果按列名构建为DataFrame
+    
+    Args:
+        cursor: 已执行查询的元组游标
+        
+    Returns:
+        查询结果DataFrame
+    """
+    columns = [desc[0] for desc in cursor.description]
+    return pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+
+
 class DatabaseConnection:
     """数据库连接管理类"""
     
@@ -25,7 +54,11 @@ class DatabaseConnection:
                  connect_timeout: int = 10,
                  read_timeout: int = 30,
                  write_timeout: int = 30,
-                 max_retries: int = 3):
+                 max_retries: int = 3,
+                 ping_interval: float = 30.0,
+                 pool_min_cached: int = 2,
+                 pool_max_cached: int = 8,
+                 pool_max_connections: int = 16):
         """
         初始化数据库连接参数
         
@@ -40,6 +73,10 @@ class DatabaseConnection:
             read_timeout: 读取超时时间（秒）
             write_timeout: 写入超时时间（秒）
             max_retries: 最大重试次数
+            ping_interval: 连接空闲超过该秒数才在使用前ping检查（0表示每次都检查，仅单连接模式）
+            pool_min_cached: 连接池初始空闲连接数
+            pool_max_cached: 连接池最大空闲连接数
+            pool_max_connections: 连接池最大连接数（达到上限时阻塞等待）
         """
         self.host = host
         self.port = port
@@ -51,10 +88,73 @@ class DatabaseConnection:
         self.read_timeout = read_timeout
         self.write_timeout = write_timeout
         self.max_retries = max_retries
-        self.connection: Optional[pymysql.Connection] = None
+        self.ping_interval = ping_interval
+        self.pool_min_cached = pool_min_cached
+        self.pool_max_cached = pool_max_cached
+        self.pool_max_connections = pool_max_connections
+        # 安装了DBUtils时使用连接池，否则退回单个长连接
+        self.pool = None
+        self.connection: Optional[mysql_driver.Connection] = None
         self.last_used_time = 0
+        self._pool_lock = threading.Lock()
+        # 显式事务状态按线程保存：事务期间该线程的语句复用同一连接且不各自提交
+        self._local = threading.local()
+    
+    @property
+    def _in_transaction(self) -> bool:
+        """当前线程是否处于显式事务中"""
+        return getattr(self._local, 'transaction_conn', None) is not None
     
-    def connect(self) -> pymysql.Connection:
+    def _connect_kwargs(self) -> dict:
+        """
+        构建数据库驱动连接参数（mysqlclient与pymysql通用）
+        
+        Returns:
+            连接参数字典
+        """
+        return dict(
+            host=self.host,
+            port=self.port,
+            user=self.user,
+            password=self.password,
+            database=self.database,
+            charset=self.charset,
+            autocommit=True,
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout,
+            write_timeout=self.write_timeout
+        )
+    
+    def _get_pool(self):
+        """
+        获取连接池（首次调用时创建）
+        
+        Returns:
+            PooledDB连接池
+        """
+        if self.pool is None:
+            with self._pool_lock:
+                if self.pool is None:
+                    try:
+                        # ping=1：每次从池中取出连接时检查，断开则自动重连
+                        # reset=False：连接为自动提交，归还时只对未结束的显式事务回滚
+                        self.pool = PooledDB(
+                            creator=mysql_driver,
+                            mincached=self.pool_min_cached,
+                            maxcached=self.pool_max_cached,
+                            maxconnections=self.pool_max_connections,
+                            blocking=True,
+                            ping=1,
+                            reset=False,
+                            **self._connect_kwargs()
+                        )
+                        logger.info(f"成功创建数据库连接池 {self.database}")
+                    except Exception as e:
+                        logger.error(f"数据库连接池创建失败: {e}")
+                        raise
+        return self.pool
+    
+    def connect(self) -> mysql_driver.Connection:
         """
         建立数据库连接
         
@@ -69,19 +169,7 @@ class DatabaseConnection:
                 pass
         
         try:
-            self.connection = pymysql.connect(
-                host=self.host,
-                port=self.port,
-                user=self.user,
-                password=self.password,
-                database=self.database,
-                charset=self.charset,
-                cursorclass=pymysql.cursors.DictCursor,
-                autocommit=True,
-                connect_timeout=self.connect_timeout,
-                read_timeout=self.read_timeout,
-                write_timeout=self.write_timeout
-            )
+            self.connection = mysql_driver.connect(**self._connect_kwargs())
             self.last_used_time = time.time()
             logger.info(f"成功连接到数据库 {self.database}")
             return self.connection
@@ -102,7 +190,7 @@ class DatabaseConnection:
         
         try:
             # 使用ping检查连接
-            self.connection.ping(reconnect=False)
+            self.connection.ping(False)
             return True
         except:
             return False
@@ -115,9 +203,9 @@ class DatabaseConnection:
             logger.warning("数据库连接已断开，正在重新连接...")
             self.connect()
     
-    def get_connection(self) -> pymysql.Connection:
+    def get_connection(self) -> mysql_driver.Connection:
         """
-        获取数据库连接（如果未连接或连接无效则自动连接）
+        获取单连接模式下的数据库连接（如果未连接或连接无效则自动连接）
         
         Returns:
             数据库连接对象
@@ -125,20 +213,55 @@ class DatabaseConnection:
         if self.connection is None or not self.connection.open:
             return self.connect()
         
-        # 检查连接是否有效
-        self._ensure_connection()
+        # 连接近期刚使用过则视为有效，省去一次ping往返；
+        # 真正断开时由 execute_* 的重连重试兜底
+        if time.time() - self.last_used_time >= self.ping_interval:
+            self._ensure_connection()
         self.last_used_time = time.time()
         return self.connection
     
+    @contextmanager
+    def _checkout(self) -> Iterator[mysql_driver.Connection]:
+        """
+        取得一个可用连接，用完后归还
+        
+        事务中复用事务连接；连接池模式下从池中取出并在退出时归还；
+        否则使用单个长连接。
+        
+        Yields:
+            数据库连接对象
+        """
+        transaction_conn = getattr(self._local, 'transaction_conn', None)
+        if transaction_conn is not None:
+            yield transaction_conn
+        elif POOL_AVAILABLE:
+            conn = self._get_pool().connection()
+            try:
+                yield conn
+            finally:
+                conn.close()
+        else:
+            yield self.get_connection()
+    
+    def _discard_connection(self):
+        """连接出错后丢弃单个长连接（连接池模式下由池在下次取出时ping并重连）"""
+        self.connection = None
+    
     def close(self):
-        """关闭数据库连接"""
+        """关闭数据库连接（及连接池）"""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+            logger.info("数据库连接池已关闭")
         if self.connection and self.connection.open:
             self.connection.close()
             logger.info("数据库连接已关闭")
     
     def execute_query(self, query: str, params: tuple = None) -> list:
         """
-        执行查询语句（带自动重连）
+        执行查询语句（带自动重连），每行返回一个字典
+        
+        适合小结果集；大结果集请使用 execute_query_df 或 execute_query_stream。
         
         Args:
             query: SQL查询语句
@@ -147,22 +270,92 @@ class DatabaseConnection:
         Returns:
             查询结果列表
         """
-        for attempt in range(self.max_retries):
-            try:
-                conn = self.get_connection()
-                with conn.cursor() as cursor:
+        return self._execute_read(query, params, mysql_driver.cursors.DictCursor,
+                                  lambda cursor: cursor.fetchall())
+    
+    def execute_query_df(self, query: str, params: tuple = None) -> pd.DataFrame:
+        """
+        执行查询语句并直接返回DataFrame（带自动重连）
+        
+        使用元组游标按列构建DataFrame，避免为每行创建字典。
+        
+        Args:
+            query: SQL查询语句
+            params: 查询参数
+            
+        Returns:
+            查询结果DataFrame
+        """
+        return self._execute_read(query, params, mysql_driver.cursors.Cursor, _rows_to_df)
+    
+    def execute_query_stream(self, query: str, params: tuple = None,
+                             chunksize: int = 50000) -> Iterator[pd.DataFrame]:
+        """
+        使用服务端游标分块读取查询结果
+        
+        结果不在客户端一次性物化，每次只取chunksize行构建DataFrame；
+        结果为空时产生一个只有列名的空DataFrame。流式读取开始后不做重连重试。
+        
+        Args:
+            query: SQL查询语句
+            params: 查询参数
+            chunksize: 每块行数
+            
+        Yields:
+            查询结果DataFrame分块
+        """
+        try:
+            with self._checkout() as conn:
+                with conn.cursor(mysql_driver.cursors.SSCursor) as cursor:
                     cursor.execute(query, params)
-                    result = cursor.fetchall()
+                    columns = [desc[0] for desc in cursor.description]
+                    has_rows = False
+                    while True:
+                        rows = cursor.fetchmany(chunksize)
+                        if not rows:
+                            break
+                        has_rows = True
+                        yield pd.DataFrame.from_records(rows, columns=columns)
+                    if not has_rows:
+                        yield pd.DataFrame(columns=columns)
                     self.last_used_time = time.time()
-                    return result
-            except (pymysql.err.OperationalError, pymysql.err.InterfaceError) as e:
+        except (mysql_driver.OperationalError, mysql_driver.InterfaceError) as e:
+            logger.error(f"流式查询执行失败: {e}")
+            self._discard_connection()
+            raise
+    
+    def _execute_read(self, query: str, params: Optional[tuple],
+                      cursor_class: Optional[type],
+                      handler: Callable[[Any], Any]) -> Any:
+        """
+        执行只读查询并用handler处理游标结果（带自动重连）
+        
+        Args:
+            query: SQL查询语句
+            params: 查询参数
+            cursor_class: 游标类型，None表示使用连接默认的元组游标
+            handler: 接收已执行游标并返回结果的函数
+            
+        Returns:
+            handler的返回值
+        """
+        for attempt in range(self.max_retries):
+            try:
+                with self._checkout() as conn:
+                    with conn.cursor(cursor_class) as cursor:
+                        cursor.execute(query, params)
+                        result = handler(cursor)
+                        self.last_used_time = time.time()
+                        return result
+            except (mysql_driver.OperationalError, mysql_driver.InterfaceError) as e:
                 error_code = e.args[0] if e.args else 0
                 # 2006: MySQL server has gone away
                 # 2013: Lost connection to MySQL server
-                if error_code in (2006, 2013) and attempt < self.max_retries - 1:
+                if error_code in (2006, 2013) and attempt < self.max_retries - 1 \
+                        and not self._in_transaction:
                     logger.warning(f"数据库连接错误 (尝试 {attempt + 1}/{self.max_retries}): {e}")
-                    # 关闭旧连接并重连
-                    self.connection = None
+                    # 丢弃旧连接，下次取连接时重连
+                    self._discard_connection()
                     time.sleep(0.5)  # 短暂等待后重试
                     continue
                 else:
@@ -183,39 +376,7 @@ class DatabaseConnection:
         Returns:
             受影响的行数
         """
-        conn = None
-        for attempt in range(self.max_retries):
-            try:
-                conn = self.get_connection()
-                with conn.cursor() as cursor:
-                    affected_rows = cursor.execute(query, params)
-                    conn.commit()
-                    self.last_used_time = time.time()
-                    return affected_rows
-            except (pymysql.err.OperationalError, pymysql.err.InterfaceError) as e:
-                error_code = e.args[0] if e.args else 0
-                if error_code in (2006, 2013) and attempt < self.max_retries - 1:
-                    logger.warning(f"数据库连接错误 (尝试 {attempt + 1}/{self.max_retries}): {e}")
-                    self.connection = None
-                    conn = None
-                    time.sleep(0.5)
-                    continue
-                else:
-                    logger.error(f"更新执行失败: {e}")
-                    if conn:
-                        try:
-                            conn.rollback()
-                        except:
-                            pass
-                    raise
-            except Exception as e:
-                logger.error(f"更新执行失败: {e}")
-                if conn:
-                    try:
-                        conn.rollback()
-                    except:
-                        pass
-                raise
+        return self._execute_write(lambda cursor: cursor.execute(query, params), "更新")
     
     def execute_many(self, query: str, params_list: list) -> int:
         """
@@ -228,43 +389,84 @@ class DatabaseConnection:
         Returns:
             受影响的行数
         """
-        conn = None
+        return self._execute_write(lambda cursor: cursor.executemany(query, params_list), "批量更新")
+    
+    def _execute_write(self, run: Callable[[Any], int], label: str) -> int:
+        """
+        在游标上执行写操作并提交（带自动重连，出错时回滚）
+        
+        Args:
+            run: 接收游标并执行语句、返回受影响行数的函数
+            label: 日志中使用的操作名称
+            
+        Returns:
+            受影响的行数
+        """
         for attempt in range(self.max_retries):
             try:
-                conn = self.get_connection()
-                with conn.cursor() as cursor:
-                    affected_rows = cursor.executemany(query, params_list)
-                    conn.commit()
+                with self._checkout() as conn:
+                    try:
+                        with conn.cursor() as cursor:
+                            affected_rows = run(cursor)
+                        if not self._in_transaction:
+                            conn.commit()
+                    except Exception:
+                        # 事务中由 transaction() 统一回滚
+                        if not self._in_transaction:
+                            try:
+                                conn.rollback()
+                            except:
+                                pass
+                        raise
                     self.last_used_time = time.time()
                     return affected_rows
-            except (pymysql.err.OperationalError, pymysql.err.InterfaceError) as e:
+            except (mysql_driver.OperationalError, mysql_driver.InterfaceError) as e:
                 error_code = e.args[0] if e.args else 0
-                if error_code in (2006, 2013) and attempt < self.max_retries - 1:
+                if error_code in (2006, 2013) and attempt < self.max_retries - 1 \
+                        and not self._in_transaction:
                     logger.warning(f"数据库连接错误 (尝试 {attempt + 1}/{self.max_retries}): {e}")
-                    self.connection = None
-                    conn = None
+                    self._discard_connection()
                     time.sleep(0.5)
                     continue
                 else:
-                    logger.error(f"批量更新执行失败: {e}")
-                    if conn:
-                        try:
-                            conn.rollback()
-                        except:
-                            pass
+                    logger.error(f"{label}执行失败: {e}")
                     raise
             except Exception as e:
-                logger.error(f"批量更新执行失败: {e}")
-                if conn:
-                    try:
-                        conn.rollback()
-                    except:
-                        pass
+                logger.error(f"{label}执行失败: {e}")
                 raise
     
+    @contextmanager
+    def transaction(self) -> Iterator[mysql_driver.Connection]:
+        """
+        显式事务上下文：期间的更新语句统一在退出时提交一次，出错则回滚
+        
+        事务独占一个连接；连接断开不会自动重连重试（否则已执行的语句会丢失），直接抛出异常。
+        
+        Yields:
+            数据库连接对象
+        """
+        with self._checkout() as conn:
+            # BEGIN 显式开启事务，在 COMMIT/ROLLBACK 前暂停自动提交
+            conn.begin()
+            self._local.transaction_conn = conn
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                try:
+                    conn.rollback()
+                except:
+                    pass
+                raise
+            finally:
+                self._local.transaction_conn = None
+    
     def __enter__(self):
         """上下文管理器入口"""
-        self.connect()
+        if POOL_AVAILABLE:
+            self._get_pool()
+        else:
+            self.connect()
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
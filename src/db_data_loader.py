@@ -3,22 +3,78 @@
 从MySQL数据库读取温度数据
 """
 
+from collections.abc import Sequence as SequenceABC
 from datetime import datetime
-from typing import List, Dict, Optional
+from functools import lru_cache
+from pathlib import Path
+from types import MappingProxyType
+from typing import List, Dict, Optional, Sequence, Mapping, Callable, Iterator
+import re
+import time
+import pandas as pd
+import yaml
 from .db_connection import DatabaseConnection
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def _to_db_time(value: str) -> str:
+    """
+    将ISO格式时间字符串转换为MySQL DATETIME格式
+    
+    Args:
+        value: ISO格式字符串或MySQL DATETIME格式字符串
+        
+    Returns:
+        MySQL DATETIME格式字符串
+    """
+    if 'T' in value:
+        return value.replace('T', ' ').split('.')[0]
+    return value
+
+
+class _LazyReadings(SequenceABC):
+    """设备读数的惰性只读序列：首次访问时才查询，结果随后复用"""
+    
+    def __init__(self, fetch: Callable[[], Dict[str, List[Dict]]], device_id: str):
+        """
+        初始化惰性读数序列
+        
+        Args:
+            fetch: 返回 设备ID -> 读数列表 的函数（调用方负责缓存）
+            device_id: 设备ID
+        """
+        self._fetch = fetch
+        self._device_id = device_id
+        self._readings: Optional[List[Dict]] = None
+    
+    def _load(self) -> List[Dict]:
+        """首次访问时加载读数"""
+        if self._readings is None:
+            self._readings = self._fetch().get(self._device_id, [])
+        return self._readings
+    
+    def __getitem__(self, index):
+        return self._load()[index]
+    
+    def __len__(self) -> int:
+        return len(self._load())
+    
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self._load())
+    
+    def __repr__(self) -> str:
+        if self._readings is None:
+            return f"<未加载的读数: {self._device_id}>"
+        return repr(self._readings)
+
+
 class DatabaseDataLoader:
     """数据库数据加载器 - 从MySQL数据库读取数据"""
     
     def __init__(self):
         """初始化数据库数据加载器"""
-        import yaml
-        from pathlib import Path
-        
         # 读取数据库配置
         config_path = Path(__file__).parent.parent.parent / "config" / "config.yaml"
         db_config = {}
@@ -39,24 +95,41 @@ class DatabaseDataLoader:
             connect_timeout=db_config.get('connect_timeout', 10),
             read_timeout=db_config.get('read_timeout', 30),
             write_timeout=db_config.get('write_timeout', 30),
-            max_retries=db_config.get('max_retries', 3)
+            max_retries=db_config.get('max_retries', 3),
+            ping_interval=db_config.get('ping_interval', 30),
+            pool_min_cached=db_config.get('pool_min_cached', 2),
+            pool_max_cached=db_config.get('pool_max_cached', 8),
+            pool_max_connections=db_config.get('pool_max_connections', 16)
         )
+        # 大结果集分块读取的每块行数
+        self.fetch_chunksize = db_config.get('fetch_chunksize', 50000)
+        # 数据版本（各设备最新读数时间）的重新检查间隔（秒），0 表示上层不缓存
+        self.cache_ttl = db_config.get('cache_ttl', 30)
+        # 清除缓存时递增，使上层缓存立即失效
+        self._cache_epoch = 0
+        # 设备ID（None表示所有设备） -> (检查时间, 最新读数时间)
+        self._latest_timestamps: Dict[Optional[str], tuple] = {}
+        # 数据库是否支持窗口函数，首次需要时查询服务器版本确定
+        self._window_functions: Optional[bool] = None
         self._devices_cache = None
     
     def load_data(self) -> Dict:
         """
         加载数据（从数据库）
         
+        各设备的 readings 为惰性序列，首次访问时才查询每个设备最近1000条读数；
+        需要序列化时请先转换为 list。
+        
         Returns:
             包含设备和读数的字典（兼容JSON格式）
         """
-        devices = self.get_all_devices()
-        
-        # 为每个设备加载读数（限制数量以避免内存问题）
-        for device in devices:
-            device_id = device['device_id']
-            # 只加载最近1000条读数
-            device['readings'] = self.get_device_readings(device_id, limit=1000)
+        # 读数按需加载：首次访问任一设备的读数时才执行一次批量查询，
+        # 只关心设备信息或元数据的调用方不产生读数查询
+        fetch_recent = lru_cache(maxsize=1)(lambda: self._fetch_recent_readings(1000))
+        devices = [
+            {**device, 'readings': _LazyReadings(fetch_recent, device['device_id'])}
+            for device in self.get_all_devices()
+        ]
         
         # 构建兼容JSON格式的数据结构
         data = {
@@ -70,27 +143,82 @@ class DatabaseDataLoader:
         
         return data
     
-    def get_all_devices(self) -> List[Dict]:
+    def _fetch_recent_readings(self, limit: int) -> Dict[str, List[Dict]]:
+        """
+        单次窗口查询取每个设备最近limit条读数（限制数量以避免内存问题）
+        
+        数据库不支持窗口函数（MySQL 8.0 / MariaDB 10.2 以下）时逐设备查询。
+        
+        Args:
+            limit: 每个设备的最大读数数量
+            
+        Returns:
+            设备ID -> 按时间正序的读数列表
+        """
+        if not self._supports_window_functions():
+            return {
+                device['device_id']: self.get_device_readings(device['device_id'], limit=limit)
+                for device in self.get_all_devices()
+            }
+        
+        df = self._query_readings_df("""
+            SELECT device_id, timestamp, temperature, humidity, status
+            FROM (
+                SELECT device_id, timestamp, temperature, humidity, status,
+                       ROW_NUMBER() OVER (PARTITION BY device_id ORDER BY timestamp DESC) AS rn
+                FROM readings
+            ) latest
+            WHERE rn <= %s
+            ORDER BY device_id, timestamp
+        """, (limit,))
+        df['timestamp'] = df['timestamp'].dt.strftime('%Y-%m-%dT%H:%M:%S')
+        
+        return {
+            device_id: group.drop(columns='device_id').to_dict('records')
+            for device_id, group in df.groupby('device_id', sort=False)
+        }
+    
+    def _supports_window_functions(self) -> bool:
+        """
+        检查数据库是否支持窗口函数（MySQL 8.0+ 或 MariaDB 10.2+），结果只查询一次
+        
+        Returns:
+            是否支持窗口函数
+        """
+        if self._window_functions is None:
+            rows = self.db.execute_query("SELECT VERSION() as version")
+            version = str(rows[0]['version']) if rows else ''
+            # 部分 MariaDB 版本号带兼容前缀 5.5.5-
+            match = re.match(r'(?:5\.5\.5-)?(\d+)\.(\d+)', version)
+            server_version = (int(match.group(1)), int(match.group(2))) if match else (0, 0)
+            required = (10, 2) if 'mariadb' in version.lower() else (8, 0)
+            self._window_functions = server_version >= required
+            if not self._window_functions:
+                logger.info(f"数据库版本 {version} 不支持窗口函数，最近读数改为逐设备查询")
+        return self._window_functions
+    
+    def get_all_devices(self) -> Sequence[Mapping]:
         """
         获取所有设备信息
         
         Returns:
-            设备列表
+            只读设备列表（需要修改时请复制为新字典）
         """
         if self._devices_cache is None:
             devices = self.db.execute_query(
                 "SELECT device_id, device_name, location FROM devices ORDER BY device_id"
             )
-            self._devices_cache = [
-                {
+            # 缓存为只读结构，调用方可直接共享，无需每次复制
+            self._devices_cache = tuple(
+                MappingProxyType({
                     'device_id': d['device_id'],
                     'device_name': d['device_name'],
                     'location': d['location']
-                }
+                })
                 for d in devices
-            ]
+            )
         
-        return self._devices_cache.copy()
+        return self._devices_cache
     
     def get_device_by_id(self, device_id: str) -> Optional[Dict]:
         """
@@ -146,40 +274,115 @@ class DatabaseDataLoader:
         
         # 时间过滤
         if start_time:
-            # 转换ISO格式到MySQL格式
-            if 'T' in start_time:
-                start_time = start_time.replace('T', ' ').split('.')[0]
             query += " AND timestamp >= %s"
-            params.append(start_time)
+            params.append(_to_db_time(start_time))
         
         if end_time:
-            # 转换ISO格式到MySQL格式
-            if 'T' in end_time:
-                end_time = end_time.replace('T', ' ').split('.')[0]
             query += " AND timestamp <= %s"
-            params.append(end_time)
-        
-        # 排序和限制
-        query += " ORDER BY timestamp DESC"
+            params.append(_to_db_time(end_time))
         
         if limit:
-            query += " LIMIT %s"
+            # 先倒序取最新N条，再在数据库中恢复正序，省去客户端反转
+            query = f"""
+                SELECT timestamp, temperature, humidity, status
+                FROM ({query} ORDER BY timestamp DESC LIMIT %s) latest
+                ORDER BY timestamp
+            """
             params.append(limit)
+        else:
+            query += " ORDER BY timestamp"
+        
+        df = self._query_readings_df(query, tuple(params))
+        if df.empty:
+            return []
+        
+        # 整列转换格式，避免逐行构造
+        df['timestamp'] = df['timestamp'].dt.strftime('%Y-%m-%dT%H:%M:%S')
+        return df.to_dict('records')
+    
+    def get_readings_df(self, device_id: Optional[str] = None,
+                        start_time: Optional[str] = None,
+                        end_time: Optional[str] = None) -> pd.DataFrame:
+        """
+        以DataFrame形式获取读数（按列构建，不经过字典列表）
+        
+        Args:
+            device_id: 设备ID，如果为None则包含所有设备
+            start_time: 开始时间 (ISO格式字符串或MySQL DATETIME格式)
+            end_time: 结束时间 (ISO格式字符串或MySQL DATETIME格式)
+            
+        Returns:
+            包含读数和设备信息的DataFrame（按时间正序）
+        """
+        # 只查询读数列，设备名称和位置由缓存的设备表在pandas中合并，
+        # 避免每行重复传输设备字符串
+        if device_id:
+            query = """
+                SELECT timestamp, temperature, humidity, status
+                FROM readings
+                WHERE device_id = %s
+            """
+            params = [device_id]
+        else:
+            query = """
+                SELECT timestamp, temperature, humidity, status, device_id
+                FROM readings
+                WHERE 1 = 1
+            """
+            params = []
         
-        results = self.db.execute_query(query, tuple(params))
+        if start_time:
+            query += " AND timestamp >= %s"
+            params.append(_to_db_time(start_time))
+        
+        if end_time:
+            query += " AND timestamp <= %s"
+            params.append(_to_db_time(end_time))
         
-        # 转换格式（反转顺序，使其按时间正序）
-        readings = []
-        for row in reversed(results):
-            readings.append({
-                'timestamp': row['timestamp'].isoformat() if isinstance(row['timestamp'], datetime) 
-                           else str(row['timestamp']),
-                'temperature': float(row['temperature']),
-                'humidity': float(row['humidity']),
-                'status': row['status']
-            })
+        query += " ORDER BY timestamp"
         
-        return readings
+        df = self._query_readings_df(query, tuple(params))
+        if device_id:
+            df['device_id'] = device_id
+        return self._attach_device_info(df)
+    
+    def _attach_device_info(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        为读数DataFrame合并设备名称和位置列
+        
+        Args:
+            df: 包含device_id列的读数DataFrame
+            
+        Returns:
+            追加了device_name和location列的DataFrame
+        """
+        columns = ['device_id', 'device_name', 'location']
+        devices = pd.DataFrame(self.get_all_devices(), columns=columns)
+        if not df['device_id'].isin(devices['device_id']).all():
+            # 设备缓存中缺少读数里的设备（新增设备），重新加载一次
+            self._devices_cache = None
+            devices = pd.DataFrame(self.get_all_devices(), columns=columns)
+        return df.merge(devices, on='device_id', how='left')
+    
+    def _query_readings_df(self, query: str, params: tuple) -> pd.DataFrame:
+        """
+        执行读数查询并统一列类型
+        
+        Args:
+            query: SQL查询语句（需包含timestamp/temperature/humidity列）
+            params: 查询参数
+            
+        Returns:
+            读数DataFrame
+        """
+        # 服务端游标分块读取，避免先把全部行物化为Python元组列表
+        chunks = self.db.execute_query_stream(query, params, self.fetch_chunksize)
+        df = pd.concat(chunks, ignore_index=True)
+        
+        # DECIMAL列转换为float64，时间列转换为datetime64
+        df[['temperature', 'humidity']] = df[['temperature', 'humidity']].astype('float64')
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        return df
     
     def get_latest_reading(self, device_id: str) -> Optional[Dict]:
         """
@@ -191,44 +394,104 @@ class DatabaseDataLoader:
         Returns:
             最新读数字典
         """
-        readings = self.get_device_readings(device_id, limit=1)
-        return readings[0] if readings else None
+        # 单行热点查询：固定SQL直接取字典行，不经过服务端游标和DataFrame转换
+        rows = self.db.execute_query(
+            "SELECT timestamp, temperature, humidity, status FROM readings "
+            "WHERE device_id = %s ORDER BY timestamp DESC LIMIT 1",
+            (device_id,)
+        )
+        if not rows:
+            return None
+        
+        row = rows[0]
+        return {
+            'timestamp': row['timestamp'].strftime('%Y-%m-%dT%H:%M:%S')
+                         if isinstance(row['timestamp'], datetime) else str(row['timestamp']),
+            'temperature': float(row['temperature']),
+            'humidity': float(row['humidity']),
+            'status': row['status']
+        }
     
-    def get_all_readings(self) -> List[Dict]:
+    def get_all_readings(self, start_time: Optional[str] = None,
+                         end_time: Optional[str] = None) -> List[Dict]:
         """
-        获取所有设备的所有读数（扁平化）
+        获取所有设备的所有读数（扁平化，单次查询，时间过滤在数据库完成）
         
+        Args:
+            start_time: 开始时间 (ISO格式字符串或MySQL DATETIME格式)
+            end_time: 结束时间 (ISO格式字符串或MySQL DATETIME格式)
+            
         Returns:
-            包含设备信息的读数列表
+            包含设备信息的读数列表（按时间正序）
+        """
+        df = self.get_readings_df(None, start_time, end_time)
+        if df.empty:
+            return []
+        
+        # 整列格式化时间戳，代替逐行 isinstance + isoformat
+        df['timestamp'] = df['timestamp'].dt.strftime('%Y-%m-%dT%H:%M:%S')
+        return df.to_dict('records')
+    
+    def get_data_version(self, device_id: Optional[str] = None):
         """
-        all_readings = []
-        devices = self.get_all_devices()
+        获取数据版本标识（清除次数和最新读数时间），用于上层缓存失效判断
         
-        for device in devices:
-            device_id = device['device_id']
-            readings = self.get_device_readings(device_id)
+        写入服务追加读数时最新时间随之变化，只有该设备（以及所有设备汇总）的缓存条目失效。
+        最新时间按设备最多每 cache_ttl 秒查询一次，走 (device_id, timestamp) 索引，
+        不扫描读数；新写入的读数因此最多延迟 cache_ttl 秒可见。原地更新的读数不改变
+        最新时间，需调用 clear_cache() 使缓存失效。
+        
+        Args:
+            device_id: 设备ID，如果为None则针对所有设备
             
-            for reading in readings:
-                reading_with_device = {
-                    **reading,
-                    'device_id': device_id,
-                    'device_name': device['device_name'],
-                    'location': device['location']
-                }
-                all_readings.append(reading_with_device)
-        
-        return all_readings
+        Returns:
+            (清除次数, 最新读数时间) 元组；cache_ttl 为0时返回None，表示不使用缓存
+        """
+        if self.cache_ttl <= 0:
+            return None
+        
+        now = time.monotonic()
+        checked = self._latest_timestamps.get(device_id)
+        if checked is None or now - checked[0] >= self.cache_ttl:
+            if device_id:
+                rows = self.db.execute_query(
+                    "SELECT MAX(timestamp) as last_timestamp FROM readings WHERE device_id = %s",
+                    (device_id,)
+                )
+            else:
+                rows = self.db.execute_query("SELECT MAX(timestamp) as last_timestamp FROM readings")
+            checked = (now, rows[0]['last_timestamp'] if rows else None)
+            self._latest_timestamps[device_id] = checked
+        return (self._cache_epoch, checked[1])
     
-    def get_statistics(self, device_id: Optional[str] = None) -> Dict:
+    def get_statistics(self, device_id: Optional[str] = None,
+                       start_time: Optional[str] = None,
+                       end_time: Optional[str] = None) -> Dict:
         """
-        获取统计信息
+        获取统计信息（在数据库中单次聚合查询完成）
         
         Args:
             device_id: 设备ID，如果为None则统计所有设备
+            start_time: 开始时间 (ISO格式字符串或MySQL DATETIME格式)
+            end_time: 结束时间 (ISO格式字符串或MySQL DATETIME格式)
             
         Returns:
             统计信息字典
         """
+        stats_query = """
+            SELECT 
+                COUNT(*) as total_readings,
+                AVG(temperature) as avg_temperature,
+                MIN(temperature) as min_temperature,
+                MAX(temperature) as max_temperature,
+                SUM(CASE WHEN status = 'alert' THEN 1 ELSE 0 END) as alert_count,
+                SUM(CASE WHEN status = 'warning' THEN 1 ELSE 0 END) as warning_count,
+                SUM(CASE WHEN status = 'normal' THEN 1 ELSE 0 END) as normal_count
+            FROM readings
+            WHERE 1 = 1
+        """
+        params = []
+        
         if device_id:
             # 单个设备统计
             device = self.db.execute_query(
@@ -239,41 +502,81 @@ class DatabaseDataLoader:
                 return {}
             
             device_name = device[0]['device_name']
-            
-            stats_query = """
-                SELECT 
-                    COUNT(*) as total_readings,
-                    AVG(temperature) as avg_temperature,
-                    MIN(temperature) as min_temperature,
-                    MAX(temperature) as max_temperature,
-                    SUM(CASE WHEN status = 'alert' THEN 1 ELSE 0 END) as alert_count,
-                    SUM(CASE WHEN status = 'warning' THEN 1 ELSE 0 END) as warning_count,
-                    SUM(CASE WHEN status = 'normal' THEN 1 ELSE 0 END) as normal_count
-                FROM readings
-                WHERE device_id = %s
-            """
-            results = self.db.execute_query(stats_query, (device_id,))
+            stats_query += " AND device_id = %s"
+            params.append(device_id)
         else:
             # 所有设备统计
             device_name = "所有设备"
-            stats_query = """
-                SELECT 
-                    COUNT(*) as total_readings,
-                    AVG(temperature) as avg_temperature,
-                    MIN(temperature) as min_temperature,
-                    MAX(temperature) as max_temperature,
-                    SUM(CASE WHEN status = 'alert' THEN 1 ELSE 0 END) as alert_count,
-                    SUM(CASE WHEN status = 'warning' THEN 1 ELSE 0 END) as warning_count,
-                    SUM(CASE WHEN status = 'normal' THEN 1 ELSE 0 END) as normal_count
-                FROM readings
-            """
-            results = self.db.execute_query(stats_query)
         
-        if not results or not results[0]['total_readings']:
+        if start_time:
+            stats_query += " AND timestamp >= %s"
+            params.append(_to_db_time(start_time))
+        
+        if end_time:
+            stats_query += " AND timestamp <= %s"
+            params.append(_to_db_time(end_time))
+        
+        results = self.db.execute_query_df(stats_query, tuple(params))
+        
+        if results.empty or not results['total_readings'].iloc[0]:
+            return {}
+        
+        return self._row_to_statistics(results.iloc[0], device_name)
+    
+    def get_statistics_bulk(self, device_ids: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """
+        批量获取多个设备的统计信息（单次 GROUP BY 查询）
+        
+        Args:
+            device_ids: 设备ID列表，如果为None则统计所有设备
+            
+        Returns:
+            设备ID -> 统计信息字典；没有读数的设备不包含在结果中
+        """
+        if device_ids is not None and not device_ids:
             return {}
         
-        row = results[0]
+        stats_query = """
+            SELECT 
+                r.device_id,
+                d.device_name,
+                COUNT(*) as total_readings,
+                AVG(r.temperature) as avg_temperature,
+                MIN(r.temperature) as min_temperature,
+                MAX(r.temperature) as max_temperature,
+                SUM(CASE WHEN r.status = 'alert' THEN 1 ELSE 0 END) as alert_count,
+                SUM(CASE WHEN r.status = 'warning' THEN 1 ELSE 0 END) as warning_count,
+                SUM(CASE WHEN r.status = 'normal' THEN 1 ELSE 0 END) as normal_count
+            FROM readings r
+            JOIN devices d ON d.device_id = r.device_id
+        """
+        params = None
+        if device_ids is not None:
+            placeholders = ', '.join(['%s'] * len(device_ids))
+            stats_query += f" WHERE r.device_id IN ({placeholders})"
+            params = tuple(device_ids)
+        stats_query += " GROUP BY r.device_id, d.device_name"
+        
+        results = self.db.execute_query_df(stats_query, params)
+        results = results[results['total_readings'] > 0]
         
+        return {
+            row['device_id']: self._row_to_statistics(row, row['device_name'])
+            for row in results.to_dict('records')
+        }
+    
+    @staticmethod
+    def _row_to_statistics(row: Dict, device_name: str) -> Dict:
+        """
+        将统计查询结果行转换为统计信息字典
+        
+        Args:
+            row: 查询结果行（字典或DataFrame行）
+            device_name: 设备名称
+            
+        Returns:
+            统计信息字典
+        """
         stats = {
             'device_name': device_name,
             'total_readings': int(row['total_readings']),
@@ -290,8 +593,10 @@ class DatabaseDataLoader:
         return stats
     
     def clear_cache(self):
-        """清除设备缓存"""
+        """清除设备缓存，并使上层按数据版本缓存的结果失效"""
         self._devices_cache = None
+        self._latest_timestamps.clear()
+        self._cache_epoch += 1
     
     def close(self):
         """关闭数据库连接"""
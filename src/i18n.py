@@ -3,247 +3,168 @@
 支持中英文切换
 """
 
-from typing import Dict
-
-# 翻译字典
-TRANSLATIONS: Dict[str, Dict[str, str]] = {
-    "zh": {
-        # 页面标题
-        "page_title": "边缘物联网温度分析系统",
-        "main_title": "🌡️ 边缘物联网温度分析系统",
-        
-        # 导航
-        "nav": "📊 导航",
-        "page_overview": "设备概览",
-        "page_detail": "设备详情",
-        "page_analysis": "综合分析",
-        "page_visualization": "数据可视化",
-        "select_device": "选择设备",
-        "select_analysis_type": "选择分析类型",
-        
-        # 按钮
-        "refresh_data": "🔄 刷新数据",
-        "start_analysis": "开始分析",
-        "manual_refresh": "立即刷新",
-        
-        # 模型状态
-        "model_status": "🤖 模型状态",
-        "local_model_loaded": "✅ 本地大模型已加载",
-        "openai_connected": "✅ OpenAI模型已连接",
-        "model_name": "模型",
-        "using_mock_mode": "⚠️ 使用模拟模式（模型未加载）",
-        "mock_mode_hint": "提示：安装llama-cpp-python并确保模型文件存在",
-        "openai_failed": "⚠️ OpenAI连接失败",
-        "openai_hint": "提示：请检查API密钥和网络连接",
-        
-        # 数据信息
-        "data_info": "📁 数据信息",
-        "device_count": "设备数量",
-        "total_readings": "总读数",
-        "last_update": "最后更新",
-        
-        # 设备概览
-        "device_overview": "📋 设备概览",
-        "device_list": "设备列表",
-        "quick_stats": "📊 快速统计",
-        "avg_temperature": "平均温度",
-        "min_temperature": "最低温度",
-        "max_temperature": "最高温度",
-        "temperature_range": "温度范围",
-        "no_devices": "没有找到设备数据",
-        
-        # 设备详情
-        "device_detail": "🔍 设备详情分析",
-        "select_device": "选择设备",
-        "statistics": "📈 统计信息",
-        "latest_reading": "📡 最新读数",
-        "time": "时间",
-        "temperature": "温度",
-        "humidity": "湿度",
-        "status": "状态",
-        "trend_analysis": "📊 趋势分析",
-        "current_temp": "当前温度",
-        "trend": "趋势",
-        "volatility": "波动性",
-        "anomaly_detection": "⚠️ 异常检测",
-        "anomalies_detected": "检测到 {count} 个异常读数",
-        "no_anomalies": "✅ 未检测到异常",
-        "ai_analysis": "🤖 AI智能分析",
-        "enable_stream": "启用流式输出",
-        "stream_hint": "实时显示AI分析生成过程",
-        "generating_analysis": "正在生成AI分析...",
-        "analyzing_data": "正在分析设备数据...",
-        
-        # 综合分析
-        "comprehensive_analysis": "🔬 综合分析",
-        "select_analysis_type": "选择分析类型",
-        "analysis_comprehensive": "综合分析",
-        "analysis_anomaly": "异常分析",
-        "analysis_trend": "趋势分析",
-        "analysis_recommendation": "建议方案",
-        "select_device_optional": "选择设备（可选）",
-        "all_devices": "所有设备",
-        "generating_report": "正在生成AI分析报告...",
-        "date_range_filter": "📅 日期区间筛选",
-        "start_date": "开始日期",
-        "end_date": "结束日期",
-        "select_date_range": "选择日期区间（可选）",
-        "use_date_filter": "启用日期筛选",
-        
-        # 数据可视化
-        "data_visualization": "📊 数据可视化",
-        "temperature_trend": "🌡️ 温度趋势",
-        "temp_humidity": "🌡️💧 温度与湿度",
-        "raw_data": "📋 原始数据",
-        "no_data": "该设备没有数据",
-        "time_label": "时间",
-        "temp_label": "温度 (°C)",
-        "humidity_label": "湿度 (%)",
-        
-        # 状态
-        "normal": "正常",
-        "warning": "警告",
-        "alert": "告警",
-        "normal_status": "正常状态",
-        "warning_status": "警告状态",
-        "alert_status": "告警状态",
-        "rising": "上升",
-        "falling": "下降",
-        "stable": "稳定",
-        
-        # 异常类型
-        "anomaly_high": "high",
-        "anomaly_low": "low",
-        "anomaly_type": "类型",
-        
-        # 表格列名
-        "device_id": "设备ID",
-        "device_name": "设备名称",
-        "location": "位置",
-        "readings_count": "读数数量",
-        "timestamp_col": "时间",
-        "temp_col": "温度",
-        "z_score": "Z-score",
-        "type_col": "类型",
-    },
-    "en": {
-        # Page titles
-        "page_title": "Edge IoT Temperature Analysis System",
-        "main_title": "🌡️ Edge IoT Temperature Analysis System",
-        
-        # Navigation
-        "nav": "📊 Navigation",
-        "page_overview": "Device Overview",
-        "page_detail": "Device Details",
-        "page_analysis": "Comprehensive Analysis",
-        "page_visualization": "Data Visualization",
-        
-        # Buttons
-        "refresh_data": "🔄 Refresh Data",
-        "start_analysis": "Start Analysis",
-        "manual_refresh": "Refresh Now",
-        
-        # Model status
-        "model_status": "🤖 Model Status",
-        "local_model_loaded": "✅ Local LLM Loaded",
-        "openai_connected": "✅ OpenAI Model Connected",
-        "model_name": "Model",
-        "using_mock_mode": "⚠️ Using Mock Mode (Model Not Loaded)",
-        "mock_mode_hint": "Tip: Install llama-cpp-python and ensure model file exists",
-        "openai_failed": "⚠️ OpenAI Connection Failed",
-        "openai_hint": "Tip: Please check API key and network connection",
-        
-        # Data info
-        "data_info": "📁 Data Information",
-        "device_count": "Device Count",
-        "total_readings": "Total Readings",
-        "last_update": "Last Update",
-        
-        # Device overview
-        "device_overview": "📋 Device Overview",
-        "device_list": "Device List",
-        "quick_stats": "📊 Quick Statistics",
-        "avg_temperature": "Average Temperature",
-        "min_temperature": "Min Temperature",
-        "max_temperature": "Max Temperature",
-        "temperature_range": "Temperature Range",
-        "no_devices": "No device data found",
-        
-        # Device detail
-        "device_detail": "🔍 Device Detail Analysis",
-        "select_device": "Select Device",
-        "statistics": "📈 Statistics",
-        "latest_reading": "📡 Latest Reading",
-        "time": "Time",
-        "temperature": "Temperature",
-        "humidity": "Humidity",
-        "status": "Status",
-        "trend_analysis": "📊 Trend Analysis",
-        "current_temp": "Current Temperature",
-        "trend": "Trend",
-        "volatility": "Volatility",
-        "anomaly_detection": "⚠️ Anomaly Detection",
-        "anomalies_detected": "Detected {count} anomaly readings",
-        "no_anomalies": "✅ No Anomalies Detected",
-        "ai_analysis": "🤖 AI Intelligent Analysis",
-        "enable_stream": "Enable Streaming Output",
-        "stream_hint": "Real-time display of AI analysis generation",
-        "generating_analysis": "Generating AI Analysis...",
-        "analyzing_data": "Analyzing device data...",
+import json
+import string
+import sys
+from pathlib import Path
+from types import MappingProxyType
+from typing import Callable, Dict, Mapping, Tuple
+
+# streamlit在模块导入时解析一次，未安装时为None（非Streamlit环境）
+try:
+    import streamlit as _st
+except ImportError:
+    _st = None
+
+# 语言代码 -> 翻译文件；默认语言在导入时加载，其他语言首次使用时才加载
+_LANGUAGE_FILES: Dict[str, Path] = {
+    "zh": Path(__file__).parent / "i18n_zh.json",
+    "en": Path(__file__).parent / "i18n_en.json",
+}
+
+# 支持的语言代码
+_VALID_LANGS = frozenset(("zh", "en"))
+
+# 语言代码 -> 已加载的翻译表（只读视图）
+_TABLES: Dict[str, Mapping[str, str]] = {}
+
+# 翻译字典（向后兼容的只读视图，只包含已加载的语言；导入后不可修改，可跨线程共享）
+TRANSLATIONS: Mapping[str, Mapping[str, str]] = MappingProxyType(_TABLES)
+
+# (语言代码, 键) -> 文本 的扁平表，命中时只需一次哈希查找
+_FLAT: Dict[Tuple[str, str], str] = {}
+
+# 静态文本与带占位符的模板分开存放：绝大多数标签是静态文本，直接返回无需格式化判断
+_STATIC: Dict[Tuple[str, str], str] = {}
+_TEMPLATES: Dict[Tuple[str, str], Callable[[Dict], str]] = {}
+
+# 模板 -> 所需的占位符名称；渲染前据此检查参数是否齐全
+_FIELDS: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+
+# 语言代码 -> 翻译命名空间（以翻译键为 __slots__ 的对象，可用 T.page_title 形式取值）
+_NAMESPACES: Dict[str, object] = {}
+
+# 翻译文本值池：文本 -> 共享的字符串对象
+_VALUE_POOL: Dict[str, str] = {}
+
+
+def _compile_template(text: str) -> Tuple[Callable[[Dict], str], Tuple[str, ...]]:
+    """
+    预先解析格式化模板，返回按参数渲染的函数（避免每次调用重新解析模板）
+    
+    Args:
+        text: 带 {name} 占位符的模板文本
         
-        # Comprehensive analysis
-        "comprehensive_analysis": "🔬 Comprehensive Analysis",
-        "select_analysis_type": "Select Analysis Type",
-        "analysis_comprehensive": "Comprehensive Analysis",
-        "analysis_anomaly": "Anomaly Analysis",
-        "analysis_trend": "Trend Analysis",
-        "analysis_recommendation": "Recommendations",
-        "select_device_optional": "Select Device (Optional)",
-        "all_devices": "All Devices",
-        "generating_report": "Generating AI Analysis Report...",
-        "date_range_filter": "📅 Date Range Filter",
-        "start_date": "Start Date",
-        "end_date": "End Date",
-        "select_date_range": "Select Date Range (Optional)",
-        "use_date_filter": "Enable Date Filter",
+    Returns:
+        (接收参数字典并返回渲染结果的函数, 模板所需的占位符名称)
+    """
+    formatter = string.Formatter()
+    parts = tuple(formatter.parse(text))
+    fields = tuple(field for _, field, _, _ in parts if field is not None)
+    
+    def render(kwargs: Dict) -> str:
+        pieces = []
+        for literal, field, spec, conversion in parts:
+            pieces.append(literal)
+            if field is not None:
+                value = kwargs[field]
+                if conversion:
+                    value = formatter.convert_field(value, conversion)
+                pieces.append(format(value, spec or ''))
+        return ''.join(pieces)
+    
+    return render, fields
+
+
+def _build_namespace(lang: str, table: Dict[str, str]) -> object:
+    """
+    把翻译表转换为以翻译键为槽位的对象，属性访问按槽位偏移取值，不需要哈希查找
+    
+    Args:
+        lang: 语言代码
+        table: 翻译表
         
-        # Data visualization
-        "data_visualization": "📊 Data Visualization",
-        "temperature_trend": "🌡️ Temperature Trend",
-        "temp_humidity": "🌡️💧 Temperature & Humidity",
-        "raw_data": "📋 Raw Data",
-        "no_data": "No data for this device",
-        "time_label": "Time",
-        "temp_label": "Temperature (°C)",
-        "humidity_label": "Humidity (%)",
+    Returns:
+        翻译命名空间对象
+    """
+    keys = tuple(key for key in table if key.isidentifier())
+    cls = type(f"_{lang.capitalize()}Table", (), {"__slots__": keys})
+    namespace = cls()
+    for key in keys:
+        setattr(namespace, key, table[key])
+    return namespace
+
+
+def _load_table(lang: str) -> Mapping[str, str]:
+    """
+    从翻译文件加载一种语言，并登记到各查找表
+    
+    Args:
+        lang: 语言代码（须在 _LANGUAGE_FILES 中）
         
-        # Status
-        "normal": "Normal",
-        "warning": "Warning",
-        "alert": "Alert",
-        "normal_status": "Normal Status",
-        "warning_status": "Warning Status",
-        "alert_status": "Alert Status",
-        "rising": "Rising",
-        "falling": "Falling",
-        "stable": "Stable",
+    Returns:
+        该语言的翻译表（只读）
+    """
+    with open(_LANGUAGE_FILES[lang], 'r', encoding='utf-8') as f:
+        raw = json.load(f)
+    
+    # 驻留所有翻译键：调用方传入的字符串常量同样是驻留的，查找时按身份比较即可命中；
+    # 各语言相同的文本（如 "high"/"Z-score"）通过值池共享同一个字符串对象
+    table = {
+        sys.intern(key): _VALUE_POOL.setdefault(value, value)
+        for key, value in raw.items()
+    }
+    for key, value in table.items():
+        _FLAT[(lang, key)] = value
+        if "{" in value:
+            _TEMPLATES[(lang, key)], _FIELDS[(lang, key)] = _compile_template(value)
+        else:
+            _STATIC[(lang, key)] = value
+    _NAMESPACES[lang] = _build_namespace(lang, table)
+    table = MappingProxyType(table)
+    _TABLES[lang] = table
+    return table
+
+
+_DEFAULT_TABLE = _load_table("zh")
+
+
+def _table_for(lang: str) -> Tuple[str, Mapping[str, str]]:
+    """
+    取得语言对应的翻译表（一次字典查找；受支持但未加载的语言此时加载）
+    
+    Args:
+        lang: 语言代码
         
-        # Anomaly types
-        "anomaly_high": "high",
-        "anomaly_low": "low",
-        "anomaly_type": "Type",
+    Returns:
+        (实际使用的语言代码, 翻译表)；未知语言按中文处理
+    """
+    table = _TABLES.get(lang)
+    if table is None:
+        if lang in _LANGUAGE_FILES:
+            table = _load_table(lang)
+        else:
+            lang, table = "zh", _DEFAULT_TABLE
+    return lang, table
+
+
+def _lookup(lang: str, key: str) -> str:
+    """
+    查找翻译文本
+    
+    未知语言按中文处理；已知语言缺少的键返回键本身。
+    
+    Args:
+        lang: 语言代码
+        key: 翻译键
         
-        # Table columns
-        "device_id": "Device ID",
-        "device_name": "Device Name",
-        "location": "Location",
-        "readings_count": "Readings Count",
-        "timestamp_col": "Time",
-        "temp_col": "Temperature",
-        "z_score": "Z-score",
-        "type_col": "Type",
-    }
-}
+    Returns:
+        翻译文本
+    """
+    text = _FLAT.get((lang, key))
+    if text is None:
+        text = _table_for(lang)[1].get(key, key)
+    return text
 
 
 def get_text(key: str, lang: str = "zh", **kwargs) -> str:
@@ -258,17 +179,18 @@ def get_text(key: str, lang: str = "zh", **kwargs) -> str:
     Returns:
         翻译后的文本
     """
-    if lang not in TRANSLATIONS:
-        lang = "zh"
+    text = _STATIC.get((lang, key))
+    if text is not None:
+        return text
     
-    text = TRANSLATIONS[lang].get(key, key)
+    lang, table = _table_for(lang)
+    text = table.get(key, key)
     
-    # 支持格式化字符串
+    # 支持格式化字符串：使用预解析的模板渲染，参数不齐全时返回原模板
     if kwargs:
-        try:
-            text = text.format(**kwargs)
-        except KeyError:
-            pass
+        render = _TEMPLATES.get((lang, key))
+        if render is not None and all(field in kwargs for field in _FIELDS[(lang, key)]):
+            return render(kwargs)
     
     return text
 
@@ -283,14 +205,14 @@ def get_language() -> str:
     Returns:
         语言代码 ("zh" 或 "en")
     """
-    try:
-        import streamlit as st
-        if 'language' not in st.session_state:
-            st.session_state.language = 'zh'  # 默认中文
-        return st.session_state.language
-    except (ImportError, RuntimeError):
-        # 非Streamlit环境，使用全局变量
-        return _global_language
+    if _st is not None:
+        try:
+            # 默认中文；setdefault 一次完成判断和初始化
+            return _st.session_state.setdefault('language', 'zh')
+        except RuntimeError:
+            pass
+    # 非Streamlit环境，使用全局变量
+    return _global_language
 
 
 def set_language(lang: str):
@@ -301,13 +223,15 @@ def set_language(lang: str):
         lang: 语言代码 ("zh" 或 "en")
     """
     global _global_language
-    if lang in ['zh', 'en']:
-        try:
-            import streamlit as st
-            st.session_state.language = lang
-        except (ImportError, RuntimeError):
-            # 非Streamlit环境，使用全局变量
-            _global_language = lang
+    if lang in _VALID_LANGS:
+        if _st is not None:
+            try:
+                _st.session_state.language = lang
+                return
+            except RuntimeError:
+                pass
+        # 非Streamlit环境，使用全局变量
+        _global_language = lang
 
 
 def t(key: str, **kwargs) -> str:
@@ -321,6 +245,38 @@ def t(key: str, **kwargs) -> str:
     Returns:
         翻译后的文本
     """
-    lang = get_language()
-    return get_text(key, lang, **kwargs)
+    # 内联 get_language()：每个标签少一次函数调用
+    lang = _global_language
+    if _st is not None:
+        try:
+            lang = _st.session_state.setdefault('language', 'zh')
+        except RuntimeError:
+            pass
+    if kwargs:
+        return get_text(key, lang, **kwargs)
+    text = _FLAT.get((lang, key))
+    if text is None:
+        text = _lookup(lang, key)
+    return text
 
+
+def labels(lang: str = None) -> object:
+    """
+    获取翻译命名空间，用属性访问代替按键查找（如 T = labels(); T.page_title）
+    
+    模板文本需要格式化时仍使用 t(key, **kwargs)；缺少的键会抛出 AttributeError，
+    可改用 t() 取得键本身作为回退。
+    
+    Args:
+        lang: 语言代码，默认使用当前语言
+        
+    Returns:
+        翻译命名空间对象
+    """
+    if lang is None:
+        lang = get_language()
+    namespace = _NAMESPACES.get(lang)
+    if namespace is None:
+        lang, _ = _table_for(lang)
+        namespace = _NAMESPACES[lang]
+    return namespace
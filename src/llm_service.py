@@ -4,28 +4,527 @@
 """
 
 import os
+import re
+import queue
+import hashlib
+import importlib.util
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Optional, Dict, List, Iterator, Callable
 import logging
 
-# 尝试导入llama-cpp-python，如果失败则使用模拟模式
-try:
-    from llama_cpp import Llama
-    LLAMA_AVAILABLE = True
-except ImportError:
-    LLAMA_AVAILABLE = False
+import numpy as np
+
+from ._kernels import simhash64
+
+# 检查llama-cpp-python和openai是否已安装（只查找模块不导入，实际使用的后端在初始化时才导入，
+# 避免只用其中一种后端时加载另一个库）
+LLAMA_AVAILABLE = importlib.util.find_spec("llama_cpp") is not None
+if not LLAMA_AVAILABLE:
     logging.warning("llama-cpp-python未安装，本地模型将不可用")
 
-# 尝试导入OpenAI，如果失败则OpenAI模式不可用
-try:
-    from openai import OpenAI
-    OPENAI_AVAILABLE = True
-except ImportError:
-    OPENAI_AVAILABLE = False
+OPENAI_AVAILABLE = importlib.util.find_spec("openai") is not None
+if not OPENAI_AVAILABLE:
     logging.warning("openai库未安装，OpenAI模式将不可用")
 
 logger = logging.getLogger(__name__)
 
+# OpenAI 对话使用的系统提示词
+_SYSTEM_PROMPT = "你是一个专业的数据分析助手，擅长分析温度传感器数据并提供专业的建议。"
+
+
+def _literal_alternation(words) -> str:
+    """
+    把一组字面短语合并为按前缀树展开的正则（共同前缀只匹配一次）
+    
+    比 "a|b|c" 形式的简单并列快得多：正则引擎在每个位置只需沿前缀树逐字符推进，
+    不必逐个尝试每个短语。
+    
+    Args:
+        words: 短语列表
+        
+    Returns:
+        正则表达式字符串
+    """
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+    
+    def build(node: Dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # 当前位置已是某个短语的结尾时，后续部分可选
+        return f'(?:{pattern})?' if '' in node else pattern
+    
+    return build(trie)
+
+
+# 去重比较时忽略的字符（保留字母、数字、汉字和"，。、"）
+_RE_NON_KEY_CHARS = re.compile(r'[^\w，。、]|_')
+
+# 两行 SimHash 的汉明距离小于该值时视为近似重复（64位中不同的位数）
+_SIMHASH_THRESHOLD = 7
+
+# 计算签名前去掉标点和空白，只差标点的两行签名相同
+_RE_SIMHASH_STRIP = re.compile(r'[\W_]+')
+
+
+def _simhash64(text: str) -> int:
+    """
+    计算文本的64位SimHash签名（去掉标点后按3字符分片，分片哈希与位计数在数值内核中完成）
+    
+    与字符集合重合度不同，分片保留了字符顺序：只改动个别关键字（如"上升"/"下降"、
+    不同的时间段或数值）的两行签名差异较大，不会被当作重复行删掉。
+    
+    Args:
+        text: 一行文本
+        
+    Returns:
+        64位签名（整数）
+    """
+    text = _RE_SIMHASH_STRIP.sub('', text)
+    codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    return int(simhash64(codes))
+
+
+def _is_near_duplicate(signature: int, other: int) -> bool:
+    """
+    判断两个SimHash签名是否近似重复
+    
+    Args:
+        signature: 签名
+        other: 另一个签名
+        
+    Returns:
+        汉明距离是否小于阈值
+    """
+    return bin(signature ^ other).count('1') < _SIMHASH_THRESHOLD
+
+
+# 模型常见的重复性结尾短语：出现时截断其后的内容（按列表顺序优先）
+_COMMON_REPEATS = (
+    "好的，我现在为您整理了",
+    "好的，我已根据要求",
+    "好的!以下是",
+    "好的!以下是基于",
+    "希望您能理解并接受",
+    "如果还有其他问题",
+    "以下是最终回答",
+    "请结合上述分析结果"
+)
+_RE_COMMON_REPEATS = re.compile(_literal_alternation(_COMMON_REPEATS))
+
+# 提示词残留和格式标记：包含任一短语的行整行移除
+_PROMPT_ARTIFACTS = (
+    "请根据要求",
+    "请根据分析结果",
+    "请检查是否有遗漏",
+    "答案是：",
+    "答案：",
+    "答案正确无误",
+    "以下是最终回答",
+    "以下是数据分析结果：",
+    "使用正式、专业的语气",
+    "请用中文回答",
+    "简洁明了",
+    "避免重复",
+    "回答采用",
+    "修改说明：",
+    "问题分析：",
+    "问题均已正确回答",
+    "好的，以下是根据",
+    "好的!以下是",
+    "好的!以下是基于",
+    "好的!以下是基于温度数据",
+    "好的，我现在",
+    "所有信息均符合要求",
+    "所有信息均符合",
+    "问题用编号标注",
+    "每句不超过",
+    "每个建议不超过",
+    "每个方面用",
+    "每个要点用",
+    "每个问题用",
+    "分点明确",
+    "要求：",
+    "要求:",
+    "请直接",
+    "请直接回答",
+    "请直接提供"
+)
+
+# 需要整行移除的行：包含残留短语、问题描述（如"每个建议不超过3句话"），
+# 或以"好的!以下是..."开头（Markdown标题以 # 开头，不会匹配）
+_RE_ARTIFACT_LINE = re.compile(
+    _literal_alternation(_PROMPT_ARTIFACTS)
+    + r'|每个[^。！？]*(?:不超过\d+句话|用\d+[-\s]*\d*句话)'
+    + r'|^好的[！!]?以下'
+)
+
+# 依次从全文中删除的片段（顺序与原实现一致），每项附带该模式必然包含的字面文本：
+# 文本中没有该字面文本时跳过这次替换（子串查找比正则扫描快得多，大多数回答一次替换都不需要）
+_ARTIFACT_SUBS = tuple((literal, re.compile(pattern)) for literal, pattern in (
+    # 包含问题描述的句子（如"每个建议不超过3句话，分点明确。"）
+    ('句话', r'每个[^。！？\n]+不超过\d+句话[^。！？\n]*[。！？]?'),
+    ('句话', r'每个[^。！？\n]+用\d+[-\s]*\d*句话[^。！？\n]*[。！？]?'),
+    ('分点明确', r'分点明确[。！？]?'),
+    ('要求', r'要求[：:][^。！？\n]*[。！？]?'),
+    # "好的!以下是..."开头的句子（保留Markdown标题）
+    ('以下', r'好的[！!]?以下[是是基于于]*[^。！？\n#]*[：:：][^。！？\n#]*[。！？]?'),
+    # 重复的"问题X已回答"等标记
+    ('已回答', r'[（(]问题\d+已回答[）)]'),
+    ('问题', r'问题\d+[：:]'),
+    # "正确"、"无误"等验证性标记
+    ('正确', r'[，,]\s*正确[。.]?'),
+    ('无误', r'[，,]\s*无误[。.]?'),
+    ('准确', r'[，,]\s*准确[。.]?'),
+    ('合理', r'[，,]\s*合理[。.]?'),
+))
+
+# 编号行（如"1. xxx"、"2、xxx"）
+_RE_NUMBERED_LINE = re.compile(r'^(\d+)[\.、]\s*(.+)')
+
+# 停止词只构建一次，各次调用共用（llama-cpp-python只接受list形式，调用方不应修改）
+# 本地模型默认停止词（防止重复和无限生成）
+_DEFAULT_STOP = ["\n\n\n", "###", "---", "<|endoftext|>", "<|end|>",
+                 "用户:", "User:", "问题:", "Question:"]
+# 分析报告的停止词（额外在模型开始输出结束语或客套话时停止）
+_ANALYSIS_STOP = ["\n\n\n", "###", "---", "分析完成", "报告结束", "希望您能理解",
+                  "如果还有其他问题", "好的，我现在", "以下是最终回答"]
+
+# GGUF文件名中的量化类型标记（如 Q4_K_M、Q8_0、IQ4_XS、F16、BF16）
+_RE_QUANT_TAG = re.compile(r'(?i)(?:^|[-_.])(?:i?q\d(?:_[a-z0-9]+)*|b?f16|f32)(?:[-_.]|$)')
+
+# 本地模型提示词预填充的逻辑批大小和物理批大小
+_N_BATCH = 2048
+_N_UBATCH = 512
+
+# 等待空闲模型上下文的最长时间（秒）：上下文被未关闭的流式生成器长期占用时，
+# 后续请求超时后使用模拟回复，而不是无限期阻塞
+_LLM_WAIT_TIMEOUT = 300
+
+# 各分析类型的提示词：固定的分析要求在前，调用时只在末尾拼接数据摘要，
+# 同一分析类型的提示词前缀逐字节相同（服务端提示词前缀缓存可以命中）
+_PROMPT_COMPREHENSIVE = """分析文末的温度传感器数据，并提供详细的分析报告。
+
+请使用Markdown格式输出，从以下方面进行分析，每个方面用2-3句话概括：
+
+## 1. 数据概览和关键指标
+
+## 2. 异常检测和风险评估
+
+## 3. 温度趋势分析
+
+## 4. 设备健康状态评估
+
+## 5. 改进建议和预防措施
+
+重要要求：
+- 使用Markdown格式：使用 ## 作为二级标题，使用 **粗体** 强调关键数据，使用列表展示要点
+- 用中文回答，语言专业但易懂
+- 每个方面只说一次，不要重复
+- 不要重复前面的内容
+- 直接给出分析结果，不要添加"好的"、"接下来"、"以下是"等过渡语
+- 不要输出问题描述或要求（如"每个方面用X句话"等）
+- 分析完成后立即结束
+
+数据如下：
+
+"""
+
+_PROMPT_ANOMALY = """分析文末温度数据中的异常情况。
+
+请使用Markdown格式输出，直接回答以下问题，每个问题用2-3句话：
+
+## 1. 异常温度点的识别
+
+## 2. 异常原因分析
+
+## 3. 异常对设备的影响
+
+## 4. 处理建议
+
+要求：
+- 使用Markdown格式：使用 ## 作为二级标题，使用 **粗体** 强调关键信息，使用列表展示要点
+- 用中文回答，简洁明了，不要重复
+- 不要添加"请"、"以下是"、"好的"等过渡语
+- 不要输出问题描述或要求
+
+数据如下：
+
+"""
+
+_PROMPT_TREND = """分析文末温度数据的趋势。
+
+请使用Markdown格式输出，直接回答，每个要点用2-3句话：
+
+## 1. 温度变化趋势
+
+## 2. 未来趋势预测
+
+## 3. 可能的风险点
+
+## 4. 建议的监控策略
+
+要求：
+- 使用Markdown格式：使用 ## 作为二级标题，使用 **粗体** 强调关键数据，使用列表展示要点
+- 用中文回答，简洁概括，不要重复
+- 直接给出分析结果，不要输出问题描述或要求
+
+数据如下：
+
+"""
+
+_PROMPT_RECOMMENDATION = """基于文末的温度数据分析，提供专业的改进建议。
+
+请使用Markdown格式输出，直接提供建议，每个方面用2-3句话：
+
+## 1. 设备维护建议
+
+## 2. 温度控制优化方案
+
+## 3. 预防措施
+
+## 4. 长期监控策略
+
+重要要求：
+- 使用Markdown格式：使用 ## 作为二级标题，使用 **粗体** 强调关键建议，使用列表展示具体措施
+- 直接给出建议，不要重复问题
+- 不要添加"好的"、"以下是"等过渡语
+- 不要输出"每个建议不超过X句话"等要求描述
+
+数据如下：
+
+"""
+
+_PROMPT_DEFAULT = """分析文末的温度数据。
+
+请使用Markdown格式输出分析结果：
+- 使用 ## 作为二级标题
+- 使用 **粗体** 强调关键信息
+- 使用列表展示要点
+- 用中文回答，简洁明了，不要重复
+
+数据如下：
+
+"""
+
+_ANALYSIS_PROMPTS = {
+    "comprehensive": _PROMPT_COMPREHENSIVE,
+    "anomaly": _PROMPT_ANOMALY,
+    "trend": _PROMPT_TREND,
+    "recommendation": _PROMPT_RECOMMENDATION,
+}
+
+# 模拟回复（模型不可用时使用）
+_MOCK_ANOMALY = """
+根据数据分析，检测到以下温度异常情况：
+
+1. **异常检测结果**：
+   - 在08:20-08:30时间段，温度持续超过29°C，达到告警级别
+   - 温度波动较大，从25.3°C快速上升到30.2°C
+
+2. **建议措施**：
+   - 立即检查设备散热系统
+   - 考虑降低设备负载或增加通风
+   - 持续监控温度变化趋势
+
+3. **风险评估**：
+   - 高温可能导致设备性能下降
+   - 建议在温度超过28°C时采取预防措施
+"""
+
+_MOCK_TREND = """
+温度趋势分析：
+
+1. **当前趋势**：温度呈下降趋势，从峰值30.2°C降至26.8°C
+2. **预测**：如果当前趋势持续，预计未来1小时内温度将稳定在26-27°C
+3. **建议**：继续保持当前状态，但需警惕温度再次上升
+"""
+
+_MOCK_DEFAULT = """
+根据提供的温度数据分析：
+
+- 设备运行状态总体正常
+- 存在部分时间段温度偏高的情况
+- 建议持续监控并采取适当的温度控制措施
+"""
+
+# 模拟回复规则：(关键词, 匹配方式, 回复)，按顺序取第一条匹配的规则
+_MOCK_RULES = (
+    (("温度", "异常"), all, _MOCK_ANOMALY),
+    (("趋势", "预测"), any, _MOCK_TREND),
+)
+
+# 分析提示词模板版本：修改提示词内容时递增，使旧的缓存结果失效
+_PROMPT_TEMPLATE_VERSION = 1
+
+
+# 已加载的本地模型：加载参数 -> (主模型实例, 上下文池)。同一进程内参数相同的服务实例
+# 共用一份模型和上下文池（如Streamlit缓存被清除后重新创建服务），不会重复加载模型文件；
+# 上下文池同时保证每个llama.cpp上下文同一时间只被一个请求使用
+_LOADED_MODELS: Dict[tuple, tuple] = {}
+_LOADED_MODELS_LOCK = threading.Lock()
+
+
+class _ResponseCache:
+    """
+    生成结果缓存（进程内LRU）
+    
+    以提示词和生成参数的SHA-256摘要为键精确匹配；相同数据摘要的重复分析请求
+    直接返回上次的结果，不再调用模型。
+    """
+    
+    def __init__(self, maxsize: int = 128):
+        """
+        初始化缓存
+        
+        Args:
+            maxsize: 最多缓存的结果数，0表示禁用缓存
+        """
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_key(*parts) -> str:
+        """
+        计算缓存键
+        
+        Args:
+            *parts: 参与计算的提示词和生成参数
+            
+        Returns:
+            十六进制摘要
+        """
+        return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        """
+        查找缓存结果
+        
+        Args:
+            key: 缓存键
+            
+        Returns:
+            缓存的文本，未命中时返回None
+        """
+        with self._lock:
+            text = self._data.get(key)
+            if text is not None:
+                self._data.move_to_end(key)
+            return text
+    
+    def put(self, key: str, text: str):
+        """
+        写入缓存结果
+        
+        Args:
+            key: 缓存键
+            text: 生成的文本
+        """
+        if self.maxsize <= 0 or not text:
+            return
+        with self._lock:
+            self._data[key] = text
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class _StreamCleaner:
+    """
+    流式输出的逐行清理
+    
+    只处理已经完整的行，末尾未完成的行留到下一个片段；逐行规则与完整后处理一致
+    （提示词残留行、纯格式行、重复编号、与最近行重复或近似重复的行），
+    使流式显示的内容与最终清理结果基本一致。
+    """
+    
+    def __init__(self):
+        self._pending: List[str] = []  # 未完成行的片段
+        self._recent = deque(maxlen=10)  # 最近输出的行及其SimHash签名
+        self._seen_numbers = set()  # 已出现的编号
+        self._last_blank = True  # 上一次输出是否为空行（开头不输出空行）
+    
+    def feed(self, chunk: str) -> str:
+        """
+        输入一个片段，返回其中已完整且清理后的行
+        
+        Args:
+            chunk: 模型输出的文本片段
+            
+        Returns:
+            可以输出的文本（可能为空字符串）
+        """
+        self._pending.append(chunk)
+        if '\n' not in chunk:
+            return ''
+        *lines, tail = ''.join(self._pending).split('\n')
+        self._pending = [tail] if tail else []
+        return ''.join(line.strip() + '\n' for line in lines if self._keep(line))
+    
+    def flush(self) -> str:
+        """
+        输出最后一个未完成的行
+        
+        Returns:
+            清理后的文本（可能为空字符串）
+        """
+        line = ''.join(self._pending).strip()
+        self._pending = []
+        return line if line and self._keep(line) else ''
+    
+    def _keep(self, line: str) -> bool:
+        """
+        判断一行是否保留，并更新去重状态
+        
+        Args:
+            line: 一行文本
+            
+        Returns:
+            是否输出该行
+        """
+        line = line.strip()
+        if not line:
+            # 只保留一个空行（Markdown段落分隔）
+            if self._last_blank:
+                return False
+            self._last_blank = True
+            return True
+        
+        # 提示词残留和纯格式行
+        if _RE_ARTIFACT_LINE.search(line) or (line.endswith('：') and len(line) < 10):
+            return False
+        
+        # 相同编号只保留第一个
+        match = _RE_NUMBERED_LINE.match(line)
+        if match:
+            if match.group(1) in self._seen_numbers:
+                return False
+        
+        # 与最近的行完全相同或近似重复
+        signature = _simhash64(line) if len(line) > 10 else None
+        for prev_line, prev_signature in self._recent:
+            if line == prev_line:
+                return False
+            if signature is not None and prev_signature is not None \
+                    and _is_near_duplicate(signature, prev_signature):
+                return False
+        
+        if match:
+            self._seen_numbers.add(match.group(1))
+        self._recent.append((line, signature))
+        self._last_blank = False
+        return True
+
 
 class LLMService:
     """大模型服务 - 支持本地模型和OpenAI"""
@@ -34,11 +533,15 @@ class LLMService:
                  model_type: str = "local",
                  model_path: str = "models/qwen-0.6b.gguf", 
                  n_ctx: int = 2048, 
-                 n_threads: int = 4,
+                 n_threads: Optional[int] = None,
+                 n_gpu_layers: Optional[int] = None,
+                 n_contexts: int = 1,
+                 preferred_quant: Optional[str] = "Q4_K_M",
                  openai_api_key: Optional[str] = None,
                  openai_model: str = "gpt-3.5-turbo",
                  openai_base_url: Optional[str] = None,
-                 openai_no_think: bool = False):
+                 openai_no_think: bool = False,
+                 response_cache_size: int = 128):
         """
         初始化LLM服务
         
@@ -46,16 +549,24 @@ class LLMService:
             model_type: 模型类型，"local" 或 "openai"
             model_path: 本地模型文件路径（当model_type="local"时使用）
             n_ctx: 上下文窗口大小（本地模型）
-            n_threads: 线程数（本地模型）
+            n_threads: 线程数（本地模型），None表示按CPU核心数自动设置（最多16）
+            n_gpu_layers: 卸载到GPU的层数（本地模型），None表示llama.cpp支持GPU时全部卸载，否则为0
+            n_contexts: 本地模型上下文数量，可同时处理的请求数（模型权重通过mmap共享，每个上下文单独占用KV缓存内存）
+            preferred_quant: 优先使用的量化版本（如 "Q4_K_M"）：model_path 未标明量化类型且同目录下
+                有对应的量化文件时改为加载该文件；None表示按原路径加载
             openai_api_key: OpenAI API密钥（当model_type="openai"时使用）
             openai_model: OpenAI模型名称，如 "gpt-3.5-turbo", "gpt-4" 等
             openai_base_url: OpenAI API基础URL（可选，用于兼容OpenAI API的代理）
             openai_no_think: 是否启用非思考模式（性能优化），响应时间可从10秒降至1秒左右
+            response_cache_size: 生成结果缓存条数（相同提示词和参数直接返回缓存结果），0表示禁用
         """
         self.model_type = model_type.lower()
         self.model_path = Path(model_path) if model_path else None
         self.n_ctx = n_ctx
-        self.n_threads = n_threads
+        self.n_threads = n_threads or min(os.cpu_count() or 4, 16)
+        self.n_gpu_layers = n_gpu_layers
+        self.n_contexts = max(1, n_contexts)
+        self.preferred_quant = preferred_quant
         self.openai_api_key = openai_api_key
         self.openai_model = openai_model
         self.openai_base_url = openai_base_url
@@ -64,11 +575,17 @@ class LLMService:
         # 本地模型相关
         self.llm = None
         self.model_loaded = False
+        # 模型上下文池：单个llama.cpp上下文不支持并发调用，每个请求借用一个空闲上下文，
+        # 全部占用时按到达顺序等待
+        self._llm_pool: queue.Queue = queue.Queue()
         
         # OpenAI客户端
         self.openai_client = None
         self.openai_available = False
         
+        # 生成结果缓存（只缓存模型真实生成的结果，不缓存模拟输出）
+        self._response_cache = _ResponseCache(response_cache_size)
+        
         # 根据模型类型初始化
         if self.model_type == "openai":
             self._init_openai()
@@ -81,11 +598,48 @@ class LLMService:
             logger.warning("llama-cpp-python未安装，本地模型将不可用")
             return
         
-        if not self.model_path or not self.model_path.exists():
+        if not self.model_path:
             logger.warning(f"模型文件不存在: {self.model_path}，将使用模拟模式")
             return
         
-        self._load_model()
+        # 先确定实际加载的文件，再用一次stat同时检查存在性并取得文件大小
+        self.model_path = self._prefer_quantized(self.model_path)
+        try:
+            model_size = self.model_path.stat().st_size
+        except OSError:
+            logger.warning(f"模型文件不存在: {self.model_path}，将使用模拟模式")
+            return
+        
+        self._load_model(model_size)
+    
+    def _prefer_quantized(self, model_path: Path) -> Path:
+        """
+        查找同一模型的量化版本
+        
+        CPU解码受内存带宽限制，量化模型每个token读取的权重字节更少，解码更快。
+        量化档位（带宽/质量权衡）：Q4_K_M（默认，最快）→ Q5_K_M → Q8_0（最接近原始精度）。
+        
+        Args:
+            model_path: 配置的模型文件路径
+            
+        Returns:
+            找到的量化模型路径；文件名已标明量化类型或没有对应量化文件时返回原路径
+        """
+        if not self.preferred_quant or _RE_QUANT_TAG.search(model_path.stem):
+            return model_path
+        
+        stem = model_path.stem.lower()
+        quant = self.preferred_quant.lower()
+        candidates = sorted(
+            path for path in model_path.parent.glob("*.gguf")
+            if path.name.lower().startswith(stem) and quant in path.stem.lower()
+        )
+        if not candidates:
+            return model_path
+        
+        logger.warning(f"模型文件 {model_path.name} 未标明量化类型，改为加载同目录下的 "
+                       f"{self.preferred_quant} 量化版本: {candidates[0].name}")
+        return candidates[0]
     
     def _init_openai(self):
         """初始化OpenAI客户端"""
@@ -97,6 +651,12 @@ class LLMService:
             logger.error("OpenAI API密钥未提供，请在配置文件中设置 openai.api_key")
             return
         
+        try:
+            from openai import OpenAI
+        except ImportError as e:
+            logger.error(f"openai库导入失败: {e}")
+            return
+        
         try:
             client_kwargs = {
                 "api_key": self.openai_api_key
@@ -111,25 +671,90 @@ class LLMService:
             logger.error(f"OpenAI客户端初始化失败: {e}")
             self.openai_available = False
     
-    def _load_model(self):
-        """加载模型"""
-        if not self.model_path or not self.model_path.exists():
-            logger.warning(f"模型文件不存在: {self.model_path}，将使用模拟模式")
+    def _load_model(self, model_size: int):
+        """
+        加载模型（调用前已确认模型文件存在）
+        
+        Args:
+            model_size: 模型文件大小（字节）
+        """
+        try:
+            import llama_cpp
+            from llama_cpp import Llama
+        except ImportError as e:
+            logger.error(f"llama-cpp-python导入失败: {e}，将使用模拟模式")
             return
         
+        n_gpu_layers = self.n_gpu_layers
+        if n_gpu_layers is None:
+            supports_gpu = getattr(llama_cpp, 'llama_supports_gpu_offload', None)
+            n_gpu_layers = -1 if supports_gpu is not None and supports_gpu() else 0
+        
+        llama_kwargs = dict(
+            model_path=str(self.model_path),
+            n_ctx=self.n_ctx,
+            n_threads=self.n_threads,
+            n_threads_batch=self.n_threads,
+            # 提示词预填充按批处理：批次越大预填充越快（llama-cpp-python会限制在n_ctx以内）
+            n_batch=_N_BATCH,
+            n_ubatch=_N_UBATCH,
+            n_gpu_layers=n_gpu_layers,
+            use_mmap=True,
+            verbose=False
+        )
+        model_key = (tuple(sorted(llama_kwargs.items())), self.n_contexts)
+        
+        # 加载期间持有锁：多个会话同时创建服务时，后来者等待并复用已加载的模型
+        with _LOADED_MODELS_LOCK:
+            loaded = _LOADED_MODELS.get(model_key)
+            if loaded is not None:
+                self.llm, self._llm_pool = loaded
+                self.model_loaded = True
+                logger.info(f"复用已加载的模型: {self.model_path}")
+                return
+            
+            try:
+                logger.info(f"正在加载模型: {self.model_path} ({model_size / 1024 ** 2:.0f} MB)")
+                logger.info(f"CPU核心数: {os.cpu_count()}，线程数: {self.n_threads}，"
+                            f"n_batch: {_N_BATCH}，n_ubatch: {_N_UBATCH}，GPU层数: {n_gpu_layers}")
+                self.llm = Llama(**llama_kwargs)
+                self._llm_pool.put(self.llm)
+                self.model_loaded = True
+                logger.info("模型加载成功")
+            except Exception as e:
+                logger.error(f"模型加载失败: {e}，将使用模拟模式")
+                self.model_loaded = False
+                return
+            
+            # 其余上下文复用同一模型文件（mmap共享权重）；创建失败时使用已有的上下文
+            for _ in range(self.n_contexts - 1):
+                try:
+                    self._llm_pool.put(Llama(**llama_kwargs))
+                except Exception as e:
+                    logger.warning(f"创建额外的模型上下文失败: {e}")
+                    break
+            logger.info(f"模型上下文数: {self._llm_pool.qsize()}")
+            _LOADED_MODELS[model_key] = (self.llm, self._llm_pool)
+    
+    @contextmanager
+    def _borrow_llm(self):
+        """
+        从上下文池借用一个模型上下文，用完后归还
+        
+        Yields:
+            Llama实例
+            
+        Raises:
+            TimeoutError: 超过 _LLM_WAIT_TIMEOUT 秒仍没有空闲的上下文
+        """
         try:
-            logger.info(f"正在加载模型: {self.model_path}")
-            self.llm = Llama(
-                model_path=str(self.model_path),
-                n_ctx=self.n_ctx,
-                n_threads=self.n_threads,
-                verbose=False
-            )
-            self.model_loaded = True
-            logger.info("模型加载成功")
-        except Exception as e:
-            logger.error(f"模型加载失败: {e}，将使用模拟模式")
-            self.model_loaded = False
+            llm = self._llm_pool.get(timeout=_LLM_WAIT_TIMEOUT)
+        except queue.Empty:
+            raise TimeoutError(f"等待空闲模型上下文超过{_LLM_WAIT_TIMEOUT}秒") from None
+        try:
+            yield llm
+        finally:
+            self._llm_pool.put(llm)
     
     def generate(self, prompt: str, max_tokens: int = 512, 
                  temperature: float = 0.7, top_p: float = 0.9,
@@ -150,9 +775,16 @@ class LLMService:
         Returns:
             生成的文本
         """
+        # 相同提示词和参数的结果直接从缓存返回
+        cache_key = self._cache_key("text", prompt, max_tokens, temperature, top_p,
+                                    stop, repeat_penalty, top_k)
+        cached = self._response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         # 如果是OpenAI模式，使用OpenAI生成
         if self.model_type == "openai":
-            return self._generate_openai(prompt, max_tokens, temperature, stop)
+            return self._generate_openai(prompt, max_tokens, temperature, stop, cache_key)
         
         # 本地模型模式
         if not self.model_loaded or self.llm is None:
@@ -160,36 +792,35 @@ class LLMService:
         
         # 默认停止词（防止重复和无限生成）
         if stop is None:
-            stop = ["\n\n\n", "###", "---", "<|endoftext|>", "<|end|>", 
-                   "用户:", "User:", "问题:", "Question:"]
+            stop = _DEFAULT_STOP
         
         try:
-            response = self.llm(
-                prompt,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                top_p=top_p,
-                top_k=top_k,
-                repeat_penalty=repeat_penalty,  # 添加重复惩罚
-                stop=stop,
-                echo=False
-            )
+            with self._borrow_llm() as llm:
+                response = llm(
+                    prompt,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    top_p=top_p,
+                    top_k=top_k,
+                    repeat_penalty=repeat_penalty,  # 添加重复惩罚
+                    stop=stop,
+                    echo=False
+                )
             
             generated_text = response['choices'][0]['text'].strip()
             
-            # 后处理：移除明显的重复模式
-            generated_text = self._remove_repetition(generated_text)
-            
-            # 移除提示词残留
-            generated_text = self._clean_prompt_artifacts(generated_text)
+            # 后处理：移除重复内容和提示词残留
+            generated_text = self.postprocess(generated_text)
             
+            self._response_cache.put(cache_key, generated_text)
             return generated_text
         except Exception as e:
             logger.error(f"生成文本时出错: {e}")
             return self._mock_generate(prompt)
     
     def _generate_openai(self, prompt: str, max_tokens: int,
-                        temperature: float, stop: Optional[List[str]]) -> str:
+                        temperature: float, stop: Optional[List[str]],
+                        cache_key: Optional[str] = None) -> str:
         """使用OpenAI API生成文本（非流式）"""
         if not self.openai_available or self.openai_client is None:
             logger.error("OpenAI客户端未初始化，将使用模拟模式")
@@ -205,7 +836,7 @@ class LLMService:
             response = self.openai_client.chat.completions.create(
                 model=self.openai_model,
                 messages=[
-                    {"role": "system", "content": "你是一个专业的数据分析助手，擅长分析温度传感器数据并提供专业的建议。"},
+                    {"role": "system", "content": _SYSTEM_PROMPT},
                     {"role": "user", "content": user_content}
                 ],
                 max_tokens=max_tokens,
@@ -214,13 +845,13 @@ class LLMService:
             )
             
             generated_text = response.choices[0].message.content.strip()
+            self._log_prompt_cache_usage(response)
             
-            # 后处理：移除明显的重复模式
-            generated_text = self._remove_repetition(generated_text)
-            
-            # 移除提示词残留
-            generated_text = self._clean_prompt_artifacts(generated_text)
+            # 后处理：移除重复内容和提示词残留
+            generated_text = self.postprocess(generated_text)
             
+            if cache_key:
+                self._response_cache.put(cache_key, generated_text)
             return generated_text
         except Exception as e:
             logger.error(f"OpenAI生成文本时出错: {e}")
@@ -230,10 +861,14 @@ class LLMService:
                        temperature: float = 0.7, top_p: float = 0.9,
                        stop: Optional[List[str]] = None,
                        repeat_penalty: float = 1.1, top_k: int = 40,
-                       callback: Optional[Callable[[str], None]] = None) -> Iterator[str]:
+                       callback: Optional[Callable[[str], None]] = None,
+                       coalesce: bool = False, clean: bool = False) -> Iterator[str]:
         """
         流式生成文本（生成器）
         
+        OpenAI默认收到片段立即输出（首字延迟最低）；本地模型的token多为半个词的碎片，
+        始终合并到约10个字符或换行时再输出。
+        
         Args:
             prompt: 输入提示词
             max_tokens: 最大生成token数
@@ -243,37 +878,162 @@ class LLMService:
             repeat_penalty: 重复惩罚系数（仅本地模型）
             top_k: top_k采样参数（仅本地模型）
             callback: 可选的回调函数，每次生成新token时调用
+            coalesce: OpenAI模式下是否也合并片段再输出（减少输出次数，但每个片段最多延迟约10个字符）
+            clean: 是否边生成边逐行清理（移除提示词残留和重复行）；开启后按完整的行输出
             
         Yields:
             生成的文本片段
         """
+        if clean:
+            cleaner = _StreamCleaner()
+            for chunk in self.generate_stream(prompt, max_tokens, temperature, top_p, stop,
+                                              repeat_penalty, top_k, coalesce=coalesce):
+                text = cleaner.feed(chunk)
+                if text:
+                    if callback:
+                        callback(text)
+                    yield text
+            text = cleaner.flush()
+            if text:
+                if callback:
+                    callback(text)
+                yield text
+            return
+        
+        # 命中缓存时按原有的分块节奏回放上次的结果
+        cache_key = self._cache_key("stream", prompt, max_tokens, temperature, top_p,
+                                    stop, repeat_penalty, top_k)
+        cached = self._response_cache.get(cache_key)
+        if cached is not None:
+            yield from self._replay(cached, callback)
+            return
+        
         if self.model_type == "openai":
-            yield from self._generate_stream_openai(prompt, max_tokens, temperature, stop, callback)
+            yield from self._generate_stream_openai(prompt, max_tokens, temperature, stop, callback,
+                                                    cache_key, coalesce)
         else:
-            yield from self._generate_stream_local(prompt, max_tokens, temperature, top_p, stop, repeat_penalty, top_k, callback)
+            yield from self._generate_stream_local(prompt, max_tokens, temperature, top_p, stop, repeat_penalty, top_k, callback, cache_key)
+    
+    def _cache_key(self, mode: str, prompt: str, *params) -> str:
+        """
+        计算生成结果的缓存键
+        
+        Args:
+            mode: 生成方式（"text" 或 "stream"，两者输出的后处理不同，分开缓存）
+            prompt: 输入提示词
+            *params: 生成参数
+            
+        Returns:
+            缓存键
+        """
+        if self.model_type == "openai":
+            model = (self.openai_model, self.openai_base_url, self.openai_no_think, _SYSTEM_PROMPT)
+        else:
+            model = (str(self.model_path),)
+        return _ResponseCache.make_key(mode, _PROMPT_TEMPLATE_VERSION, self.model_type, model,
+                                       prompt, params)
+    
+    def _replay(self, text: str, callback: Optional[Callable[[str], None]],
+                size: int = 10) -> Iterator[str]:
+        """
+        把缓存的文本按固定长度分块输出
+        
+        Args:
+            text: 缓存的文本
+            callback: 可选的回调函数
+            size: 每块的字符数
+            
+        Yields:
+            文本片段
+        """
+        for i in range(0, len(text), size):
+            chunk = text[i:i + size]
+            if callback:
+                callback(chunk)
+            yield chunk
+    
+    @staticmethod
+    def _coalesce(deltas: Iterator[Optional[str]], callback: Optional[Callable[[str], None]],
+                  parts: List[str], min_len: int = 10) -> Iterator[str]:
+        """
+        把模型逐token返回的片段合并后输出：积累到一定长度或遇到换行时输出一次
+        
+        片段先放入列表，输出时一次拼接，避免逐token做字符串拼接。
+        
+        Args:
+            deltas: 模型返回的文本片段（空片段会被跳过）
+            callback: 可选的回调函数
+            parts: 收集完整输出的列表（调用方用于缓存结果）
+            min_len: 合并输出的最小字符数
+            
+        Yields:
+            合并后的文本片段
+        """
+        pending = []
+        pending_len = 0
+        for delta in deltas:
+            if not delta:
+                continue
+            parts.append(delta)
+            pending.append(delta)
+            pending_len += len(delta)
+            
+            # 当缓冲区积累到一定长度或遇到换行时，yield一次
+            if '\n' in delta or pending_len >= min_len:
+                chunk = ''.join(pending)
+                pending.clear()
+                pending_len = 0
+                if callback:
+                    callback(chunk)
+                yield chunk
+        
+        # 输出剩余的缓冲区内容
+        if pending:
+            chunk = ''.join(pending)
+            if callback:
+                callback(chunk)
+            yield chunk
+    
+    @staticmethod
+    def _log_prompt_cache_usage(response):
+        """
+        记录服务端提示词前缀缓存的命中情况（接口未返回用量信息时忽略）
+        
+        Args:
+            response: OpenAI 接口响应
+        """
+        usage = getattr(response, 'usage', None)
+        details = getattr(usage, 'prompt_tokens_details', None)
+        cached_tokens = getattr(details, 'cached_tokens', None)
+        if cached_tokens is not None:
+            logger.debug(f"提示词缓存命中 {cached_tokens}/{usage.prompt_tokens} tokens")
     
     def _generate_stream_local(self, prompt: str, max_tokens: int,
                                temperature: float, top_p: float,
                                stop: Optional[List[str]], repeat_penalty: float, top_k: int,
-                               callback: Optional[Callable[[str], None]]) -> Iterator[str]:
+                               callback: Optional[Callable[[str], None]],
+                               cache_key: Optional[str] = None) -> Iterator[str]:
         """使用本地模型流式生成文本"""
         if not self.model_loaded or self.llm is None:
             # 模拟流式输出
-            mock_text = self._mock_generate(prompt)
-            for char in mock_text:
-                if callback:
-                    callback(char)
-                yield char
+            yield from self._replay(self._mock_generate(prompt), callback, 16)
             return
         
         # 默认停止词
         if stop is None:
-            stop = ["\n\n\n", "###", "---", "<|endoftext|>", "<|end|>", 
-                   "用户:", "User:", "问题:", "Question:"]
+            stop = _DEFAULT_STOP
         
+        # 整个流式输出期间占用一个模型上下文，调用方提前关闭生成器时在 finally 中归还；
+        # 长时间没有空闲上下文时使用模拟输出
+        try:
+            llm = self._llm_pool.get(timeout=_LLM_WAIT_TIMEOUT)
+        except queue.Empty:
+            logger.error(f"等待空闲模型上下文超过{_LLM_WAIT_TIMEOUT}秒，将使用模拟模式")
+            yield from self._replay(self._mock_generate(prompt), callback, 16)
+            return
         try:
             # 使用流式生成
-            stream = self.llm(
+            stream = llm(
                 prompt,
                 max_tokens=max_tokens,
                 temperature=temperature,
@@ -285,49 +1045,30 @@ class LLMService:
                 stream=True  # 启用流式输出
             )
             
-            accumulated_text = ""
-            buffer = ""
+            parts = []
+            deltas = (output['choices'][0].get('text', '')
+                      for output in stream if output.get('choices'))
+            yield from self._coalesce(deltas, callback, parts)
             
-            for output in stream:
-                if 'choices' in output and len(output['choices']) > 0:
-                    delta = output['choices'][0].get('text', '')
-                    if delta:
-                        accumulated_text += delta
-                        buffer += delta
-                        
-                        # 当缓冲区积累到一定长度或遇到换行时，yield一次
-                        if '\n' in buffer or len(buffer) >= 10:
-                            if callback:
-                                callback(buffer)
-                            yield buffer
-                            buffer = ""
-            
-            # 输出剩余的缓冲区内容
-            if buffer:
-                if callback:
-                    callback(buffer)
-                yield buffer
+            if cache_key:
+                self._response_cache.put(cache_key, ''.join(parts))
             
         except Exception as e:
             logger.error(f"本地模型流式生成文本时出错: {e}")
             # 出错时返回模拟结果
-            mock_text = self._mock_generate(prompt)
-            for char in mock_text:
-                if callback:
-                    callback(char)
-                yield char
+            yield from self._replay(self._mock_generate(prompt), callback, 16)
+        finally:
+            self._llm_pool.put(llm)
     
     def _generate_stream_openai(self, prompt: str, max_tokens: int,
                                temperature: float, stop: Optional[List[str]],
-                               callback: Optional[Callable[[str], None]]) -> Iterator[str]:
+                               callback: Optional[Callable[[str], None]],
+                               cache_key: Optional[str] = None,
+                               coalesce: bool = False) -> Iterator[str]:
         """使用OpenAI API流式生成文本"""
         if not self.openai_available or self.openai_client is None:
             logger.error("OpenAI客户端未初始化，将使用模拟模式")
-            mock_text = self._mock_generate(prompt)
-            for char in mock_text:
-                if callback:
-                    callback(char)
-                yield char
+            yield from self._replay(self._mock_generate(prompt), callback, 16)
             return
         
         try:
@@ -340,7 +1081,7 @@ class LLMService:
             stream = self.openai_client.chat.completions.create(
                 model=self.openai_model,
                 messages=[
-                    {"role": "system", "content": "你是一个专业的数据分析助手，擅长分析温度传感器数据并提供专业的建议。"},
+                    {"role": "system", "content": _SYSTEM_PROMPT},
                     {"role": "user", "content": user_content}
                 ],
                 max_tokens=max_tokens,
@@ -349,35 +1090,44 @@ class LLMService:
                 stream=True
             )
             
-            buffer = ""
-            for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    content = chunk.choices[0].delta.content
-                    buffer += content
-                    
-                    # 当缓冲区积累到一定长度或遇到换行时，yield一次
-                    if '\n' in buffer or len(buffer) >= 10:
+            parts = []
+            deltas = (chunk.choices[0].delta.content for chunk in stream)
+            if coalesce:
+                yield from self._coalesce(deltas, callback, parts)
+            else:
+                # SDK按网络到达节奏返回片段，收到即输出
+                for delta in deltas:
+                    if delta:
+                        parts.append(delta)
                         if callback:
-                            callback(buffer)
-                        yield buffer
-                        buffer = ""
+                            callback(delta)
+                        yield delta
             
-            # 输出剩余的缓冲区内容
-            if buffer:
-                if callback:
-                    callback(buffer)
-                yield buffer
+            if cache_key:
+                self._response_cache.put(cache_key, ''.join(parts))
                 
         except Exception as e:
             logger.error(f"OpenAI流式生成文本时出错: {e}")
             # 出错时返回模拟结果
-            mock_text = self._mock_generate(prompt)
-            for char in mock_text:
-                if callback:
-                    callback(char)
-                yield char
+            yield from self._replay(self._mock_generate(prompt), callback, 16)
     
-    def _remove_repetition(self, text: str, max_repeat: int = 2) -> str:
+    @classmethod
+    def postprocess(cls, text: str) -> str:
+        """
+        生成结果的后处理：移除重复内容和提示词残留
+        
+        非流式生成已自动处理；流式输出结束后，调用方对拼接的完整文本调用本方法。
+        
+        Args:
+            text: 模型生成的文本
+            
+        Returns:
+            清理后的文本
+        """
+        return cls._clean_prompt_artifacts(cls._remove_repetition(text))
+    
+    @staticmethod
+    def _remove_repetition(text: str, max_repeat: int = 2) -> str:
         """
         移除文本中的重复内容
         
@@ -391,77 +1141,71 @@ class LLMService:
         if not text:
             return text
         
-        # 移除明显的重复段落（通过查找重复的句子序列）
-        # 先按段落分割
-        paragraphs = text.split('\n\n')
-        unique_paragraphs = []
+        # 段落级和行级去重在同一趟循环中完成：逐段去重后直接逐行处理，
+        # 不再把段落拼回全文后重新按行分割（段落之间相当于一个空行）
         seen_paragraphs = set()
+        cleaned_lines = []
+        # 最近10行及其SimHash签名（只有超过10个字符的行参与近似比较，签名每行只计算一次）
+        last_lines = deque(maxlen=10)
+        first_paragraph = True
         
-        for para in paragraphs:
+        for para in text.split('\n\n'):
             para = para.strip()
             if not para:
                 continue
             
-            # 使用段落的前50个字符作为唯一性标识
-            para_key = para[:50].strip() if len(para) > 50 else para.strip()
-            # 归一化：移除数字和特殊字符进行比较
-            para_normalized = ''.join(c for c in para_key if c.isalnum() or c in '，。、')
-            
-            if para_normalized and para_normalized not in seen_paragraphs:
-                seen_paragraphs.add(para_normalized)
-                unique_paragraphs.append(para)
-        
-        text = '\n\n'.join(unique_paragraphs)
-        
-        # 移除行级别的重复
-        lines = text.split('\n')
-        cleaned_lines = []
-        last_lines = []
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                if cleaned_lines and cleaned_lines[-1]:  # 只保留一个空行
-                    cleaned_lines.append('')
+            # 移除明显的重复段落：使用段落的前50个字符作为唯一性标识，
+            # 归一化（移除数字和特殊字符）后进行比较
+            para_normalized = _RE_NON_KEY_CHARS.sub('', para[:50].strip())
+            if not para_normalized or para_normalized in seen_paragraphs:
                 continue
+            seen_paragraphs.add(para_normalized)
             
-            # 检查是否与最近的行重复
-            is_repeat = False
-            for prev_line in last_lines:
-                # 如果当前行与之前的行完全相同，或者是之前行的子串，则跳过
-                if line == prev_line:
-                    is_repeat = True
-                    break
-                # 如果当前行是之前行的重复（超过80%相似）
-                if len(line) > 10 and len(prev_line) > 10:
-                    similarity = len(set(line) & set(prev_line)) / max(len(set(line)), len(set(prev_line)))
-                    if similarity > 0.8:
+            lines = para.split('\n')
+            if not first_paragraph:
+                lines.insert(0, '')
+            first_paragraph = False
+            
+            # 移除行级别的重复
+            for line in lines:
+                line = line.strip()
+                if not line:
+                    if cleaned_lines and cleaned_lines[-1]:  # 只保留一个空行
+                        cleaned_lines.append('')
+                    continue
+                
+                # 检查是否与最近的行重复
+                is_repeat = False
+                signature = _simhash64(line) if len(line) > 10 else None
+                for prev_line, prev_signature in last_lines:
+                    # 如果当前行与之前的行完全相同，则跳过
+                    if line == prev_line:
                         is_repeat = True
                         break
-            
-            if not is_repeat:
-                cleaned_lines.append(line)
-                # 维护最近的行历史（最多10行）
-                last_lines.append(line)
-                if len(last_lines) > 10:
-                    last_lines.pop(0)
+                    # 如果当前行与之前的行近似重复（SimHash汉明距离小于阈值）
+                    if signature is not None and prev_signature is not None \
+                            and _is_near_duplicate(signature, prev_signature):
+                        is_repeat = True
+                        break
+                
+                if not is_repeat:
+                    cleaned_lines.append(line)
+                    # 维护最近的行历史（最多10行）
+                    last_lines.append((line, signature))
         
         result = '\n'.join(cleaned_lines)
         
         # 移除句子级别的重复
-        sentences = result.split('。')
         unique_sentences = []
         seen_sentences = set()
         
-        for sentence in sentences:
+        for sentence in result.split('。'):
             sentence = sentence.strip()
-            if not sentence or len(sentence) < 5:
+            if len(sentence) < 5:
                 continue
             
-            # 使用前30个字符作为唯一性标识
-            key = sentence[:30] if len(sentence) > 30 else sentence
-            # 归一化键
-            key_normalized = ''.join(c for c in key if c.isalnum() or c in '，。、')
+            # 使用前30个字符作为唯一性标识，并归一化
+            key_normalized = _RE_NON_KEY_CHARS.sub('', sentence[:30])
             
             if key_normalized and key_normalized not in seen_sentences:
                 seen_sentences.add(key_normalized)
@@ -469,30 +1213,19 @@ class LLMService:
         
         result = '。'.join(unique_sentences) if unique_sentences else result
         
-        # 移除明显的重复短语（如"好的，我现在为您整理了"等）
-        common_repeats = [
-            "好的，我现在为您整理了",
-            "好的，我已根据要求",
-            "好的!以下是",
-            "好的!以下是基于",
-            "希望您能理解并接受",
-            "如果还有其他问题",
-            "以下是最终回答",
-            "请结合上述分析结果"
-        ]
-        
-        for repeat_phrase in common_repeats:
-            if repeat_phrase in result:
-                # 找到并移除包含重复短语的句子
-                parts = result.split(repeat_phrase)
-                if len(parts) > 1:
-                    # 保留第一部分，移除后续重复部分
-                    result = parts[0].strip()
+        # 移除明显的重复短语（如"好的，我现在为您整理了"等）：
+        # 先用合并的正则判断是否出现任一短语，绝大多数文本一次扫描即可跳过
+        if _RE_COMMON_REPEATS.search(result):
+            for repeat_phrase in _COMMON_REPEATS:
+                if repeat_phrase in result:
+                    # 找到并移除包含重复短语的句子：保留第一部分，移除后续重复部分
+                    result = result.split(repeat_phrase, 1)[0].strip()
                     break
         
         return result.strip()
     
-    def _clean_prompt_artifacts(self, text: str) -> str:
+    @staticmethod
+    def _clean_prompt_artifacts(text: str) -> str:
         """
         清理提示词残留和格式问题
         
@@ -505,78 +1238,23 @@ class LLMService:
         if not text:
             return text
         
-        import re
-        
-        # 移除常见的提示词残留和格式标记
-        artifacts = [
-            "请根据要求",
-            "请根据分析结果",
-            "请检查是否有遗漏",
-            "答案是：",
-            "答案：",
-            "答案正确无误",
-            "以下是最终回答",
-            "以下是数据分析结果：",
-            "使用正式、专业的语气",
-            "请用中文回答",
-            "简洁明了",
-            "避免重复",
-            "回答采用",
-            "修改说明：",
-            "问题分析：",
-            "问题均已正确回答",
-            "好的，以下是根据",
-            "好的!以下是",
-            "好的!以下是基于",
-            "好的!以下是基于温度数据",
-            "好的，我现在",
-            "所有信息均符合要求",
-            "所有信息均符合",
-            "问题用编号标注",
-            "每句不超过",
-            "每个建议不超过",
-            "每个方面用",
-            "每个要点用",
-            "每个问题用",
-            "分点明确",
-            "要求：",
-            "要求:",
-            "请直接",
-            "请直接回答",
-            "请直接提供"
-        ]
-        
-        lines = text.split('\n')
         cleaned_lines = []
         
-        for line in lines:
+        for line in text.split('\n'):
             line = line.strip()
             if not line:
                 continue
             
-            # 检查是否包含提示词残留
-            is_artifact = False
-            for artifact in artifacts:
-                if artifact in line:
-                    is_artifact = True
-                    break
+            # 检查是否包含提示词残留、问题描述（如"每个建议不超过3句话"）
+            # 或"好的!以下是..."开头（一次正则扫描完成全部判断）
+            if _RE_ARTIFACT_LINE.search(line):
+                continue
             
             # 检查是否是纯格式行（如"修改说明："、"问题分析："等）
             if line.endswith('：') and len(line) < 10:
-                is_artifact = True
-            
-            # 检查是否是问题描述行（如"每个建议不超过3句话，分点明确。"）
-            if re.search(r'每个[^。！？]*不超过\d+句话', line) or \
-               re.search(r'每个[^。！？]*用\d+[-\s]*\d*句话', line) or \
-               re.search(r'分点明确', line) and len(line) < 20:
-                is_artifact = True
-            
-            # 检查是否是"好的!以下是..."开头的行（但不包括Markdown标题）
-            if re.match(r'好的[！!]?以下[是是基于于]*', line) and not line.strip().startswith('#'):
-                is_artifact = True
+                continue
             
-            if not is_artifact:
-                cleaned_lines.append(line)
+            cleaned_lines.append(line)
         
         result = '\n'.join(cleaned_lines)
         
@@ -584,39 +1262,22 @@ class LLMService:
         if result.startswith('- '):
             result = result[2:].strip()
         
-        # 移除包含问题描述的句子（如"每个建议不超过3句话，分点明确。"）
-        result = re.sub(r'每个[^。！？\n]+不超过\d+句话[^。！？\n]*[。！？]?', '', result)
-        result = re.sub(r'每个[^。！？\n]+用\d+[-\s]*\d*句话[^。！？\n]*[。！？]?', '', result)
-        result = re.sub(r'分点明确[。！？]?', '', result)
-        result = re.sub(r'要求[：:][^。！？\n]*[。！？]?', '', result)
-        
-        # 移除"好的!以下是..."开头的句子（但要保留Markdown标题）
-        result = re.sub(r'好的[！!]?以下[是是基于于]*[^。！？\n#]*[：:：][^。！？\n#]*[。！？]?', '', result)
-        
-        # 移除重复的"问题X已回答"等标记
-        result = re.sub(r'[（(]问题\d+已回答[）)]', '', result)
-        result = re.sub(r'问题\d+[：:]', '', result)
-        
-        # 移除"正确"、"无误"等验证性标记
-        result = re.sub(r'[，,]\s*正确[。.]?', '', result)
-        result = re.sub(r'[，,]\s*无误[。.]?', '', result)
-        result = re.sub(r'[，,]\s*准确[。.]?', '', result)
-        result = re.sub(r'[，,]\s*合理[。.]?', '', result)
+        # 依次移除问题描述句、"好的!以下是..."开头的句子、"问题X已回答"标记和验证性标记
+        for literal, pattern in _ARTIFACT_SUBS:
+            if literal in result:
+                result = pattern.sub('', result)
         
         # 移除重复的编号和内容（相同编号只保留第一个）
-        lines = result.split('\n')
         seen_numbers = set()  # 已出现的编号
         final_lines = []
         
-        for line in lines:
+        for line in result.split('\n'):
             line = line.strip()
             if not line:
-                if final_lines and final_lines[-1]:  # 只保留一个空行
-                    continue
                 continue
             
             # 检查是否是编号行
-            match = re.match(r'^(\d+)[\.、]\s*(.+)', line)
+            match = _RE_NUMBERED_LINE.match(line)
             if match:
                 num = match.group(1)
                 # 如果这个编号已经出现过，跳过（只保留第一个）
@@ -643,40 +1304,11 @@ class LLMService:
         Returns:
             模拟的生成文本
         """
-        # 简单的规则基础回复
-        if "温度" in prompt and "异常" in prompt:
-            return """
-根据数据分析，检测到以下温度异常情况：
-
-1. **异常检测结果**：
-   - 在08:20-08:30时间段，温度持续超过29°C，达到告警级别
-   - 温度波动较大，从25.3°C快速上升到30.2°C
-
-2. **建议措施**：
-   - 立即检查设备散热系统
-   - 考虑降低设备负载或增加通风
-   - 持续监控温度变化趋势
-
-3. **风险评估**：
-   - 高温可能导致设备性能下降
-   - 建议在温度超过28°C时采取预防措施
-"""
-        elif "趋势" in prompt or "预测" in prompt:
-            return """
-温度趋势分析：
-
-1. **当前趋势**：温度呈下降趋势，从峰值30.2°C降至26.8°C
-2. **预测**：如果当前趋势持续，预计未来1小时内温度将稳定在26-27°C
-3. **建议**：继续保持当前状态，但需警惕温度再次上升
-"""
-        else:
-            return """
-根据提供的温度数据分析：
-
-- 设备运行状态总体正常
-- 存在部分时间段温度偏高的情况
-- 建议持续监控并采取适当的温度控制措施
-"""
+        # 简单的规则基础回复：按顺序匹配第一条规则
+        return next(
+            (reply for keywords, match, reply in _MOCK_RULES if match(k in prompt for k in keywords)),
+            _MOCK_DEFAULT
+        )
     
     def analyze_temperature_data_stream(self, data_summary: str,
                                         analysis_type: str = "comprehensive",
@@ -702,15 +1334,15 @@ class LLMService:
             top_p=0.9,
             top_k=40,
             repeat_penalty=1.2,
-            stop=["\n\n\n", "###", "---", "分析完成", "报告结束", "希望您能理解", 
-                  "如果还有其他问题", "好的，我现在", "以下是最终回答"],
-            callback=callback
+            stop=_ANALYSIS_STOP,
+            callback=callback,
+            clean=True
         ):
             yield chunk
     
     def _build_analysis_prompt(self, data_summary: str, analysis_type: str) -> str:
         """
-        构建分析提示词
+        构建分析提示词（预先定义的提示词前缀 + 数据摘要）
         
         Args:
             data_summary: 数据摘要
@@ -719,104 +1351,7 @@ class LLMService:
         Returns:
             提示词字符串
         """
-        if analysis_type == "comprehensive":
-            return f"""分析以下温度传感器数据，并提供详细的分析报告：
-
-{data_summary}
-
-请使用Markdown格式输出，从以下方面进行分析，每个方面用2-3句话概括：
-
-## 1. 数据概览和关键指标
-
-## 2. 异常检测和风险评估
-
-## 3. 温度趋势分析
-
-## 4. 设备健康状态评估
-
-## 5. 改进建议和预防措施
-
-重要要求：
-- 使用Markdown格式：使用 ## 作为二级标题，使用 **粗体** 强调关键数据，使用列表展示要点
-- 用中文回答，语言专业但易懂
-- 每个方面只说一次，不要重复
-- 不要重复前面的内容
-- 直接给出分析结果，不要添加"好的"、"接下来"、"以下是"等过渡语
-- 不要输出问题描述或要求（如"每个方面用X句话"等）
-- 分析完成后立即结束"""
-        
-        elif analysis_type == "anomaly":
-            return f"""分析以下温度数据中的异常情况：
-
-{data_summary}
-
-请使用Markdown格式输出，直接回答以下问题，每个问题用2-3句话：
-
-## 1. 异常温度点的识别
-
-## 2. 异常原因分析
-
-## 3. 异常对设备的影响
-
-## 4. 处理建议
-
-要求：
-- 使用Markdown格式：使用 ## 作为二级标题，使用 **粗体** 强调关键信息，使用列表展示要点
-- 用中文回答，简洁明了，不要重复
-- 不要添加"请"、"以下是"、"好的"等过渡语
-- 不要输出问题描述或要求"""
-        
-        elif analysis_type == "trend":
-            return f"""分析以下温度数据的趋势：
-
-{data_summary}
-
-请使用Markdown格式输出，直接回答，每个要点用2-3句话：
-
-## 1. 温度变化趋势
-
-## 2. 未来趋势预测
-
-## 3. 可能的风险点
-
-## 4. 建议的监控策略
-
-要求：
-- 使用Markdown格式：使用 ## 作为二级标题，使用 **粗体** 强调关键数据，使用列表展示要点
-- 用中文回答，简洁概括，不要重复
-- 直接给出分析结果，不要输出问题描述或要求"""
-        
-        elif analysis_type == "recommendation":
-            return f"""基于以下温度数据分析，提供专业的改进建议：
-
-{data_summary}
-
-请使用Markdown格式输出，直接提供建议，每个方面用2-3句话：
-
-## 1. 设备维护建议
-
-## 2. 温度控制优化方案
-
-## 3. 预防措施
-
-## 4. 长期监控策略
-
-重要要求：
-- 使用Markdown格式：使用 ## 作为二级标题，使用 **粗体** 强调关键建议，使用列表展示具体措施
-- 直接给出建议，不要重复问题
-- 不要添加"好的"、"以下是"等过渡语
-- 不要输出"每个建议不超过X句话"等要求描述"""
-        
-        else:
-            return f"""分析以下温度数据：
-
-{data_summary}
-
-请使用Markdown格式输出分析结果：
-- 使用 ## 作为二级标题
-- 使用 **粗体** 强调关键信息
-- 使用列表展示要点
-- 用中文回答，简洁明了，不要重复"""
+        return _ANALYSIS_PROMPTS.get(analysis_type, _PROMPT_DEFAULT) + data_summary
     
     def analyze_temperature_data(self, data_summary: str, 
                                  analysis_type: str = "comprehensive") -> str:
@@ -840,8 +1375,7 @@ class LLMService:
             top_p=0.9,
             top_k=40,
             repeat_penalty=1.2,  # 增加重复惩罚
-            stop=["\n\n\n", "###", "---", "分析完成", "报告结束", "希望您能理解", 
-                  "如果还有其他问题", "好的，我现在", "以下是最终回答"]
+            stop=_ANALYSIS_STOP
         )
     
     def is_available(self) -> bool:
@@ -5,18 +5,24 @@ Streamlit Web应用
 """
 
 import streamlit as st
-import plotly.graph_objects as go
-import plotly.express as px
-from plotly.subplots import make_subplots
+import yaml
+import numpy as np
+import pandas as pd
 import sys
+import html
+import operator
+import time
+from datetime import datetime, timedelta
 from pathlib import Path
+from types import SimpleNamespace
 
 # 添加项目根目录到路径
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from src.analyzer import TemperatureAnalyzer
-from src.i18n import t, get_language, set_language
+from src._kernels import lttb_indices
+from src.i18n import t, get_text, get_language, set_language, labels
 
 # 初始化语言（需要在set_page_config之前）
 if 'language' not in st.session_state:
@@ -50,159 +56,455 @@ st.markdown("""
     .stAlert {
         margin-top: 1rem;
     }
+    .metric-grid {
+        display: grid;
+        gap: 1rem;
+        margin-bottom: 1rem;
+    }
+    .metric-label {
+        font-size: 0.875rem;
+        opacity: 0.7;
+    }
+    .metric-value {
+        font-size: 1.75rem;
+    }
 </style>
 """, unsafe_allow_html=True)
 
+# 配置文件路径
+_CONFIG_PATH = Path(__file__).parent.parent / "config" / "config.yaml"
+
+
+# 读取配置文件（使用缓存：Streamlit每次交互都会重新执行本脚本，
+# 配置只在首次使用时解析一次，各会话共用）
+@st.cache_resource
+def _load_config(config_path: Path = _CONFIG_PATH) -> SimpleNamespace:
+    """
+    读取并解析配置文件，返回分析器参数（字段与 TemperatureAnalyzer 的参数一一对应）
+    
+    Args:
+        config_path: 配置文件路径，文件不存在时全部使用默认值
+        
+    Returns:
+        分析器参数
+    """
+    # 优先使用libyaml的C解析器
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    
+    config = {}
+    if config_path.exists():
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = yaml.load(f, Loader=loader) or {}
+    
+    # 数据源配置
+    data_config = config.get('data', {})
+    # 模型配置
+    model_config = config.get('model', {})
+    # OpenAI配置
+    openai_config = config.get('openai', {})
+    
+    return SimpleNamespace(
+        use_database=data_config.get('source', 'json') == 'database',
+        model_type=model_config.get('type', 'local'),
+        model_path=model_config.get('path', 'models/qwen-0.6b.gguf'),
+        n_ctx=model_config.get('n_ctx', 2048),
+        n_threads=model_config.get('n_threads'),
+        n_gpu_layers=model_config.get('n_gpu_layers'),
+        n_contexts=model_config.get('n_contexts', 1),
+        preferred_quant=model_config.get('preferred_quant', 'Q4_K_M'),
+        openai_api_key=openai_config.get('api_key'),
+        openai_model=openai_config.get('model', 'gpt-3.5-turbo'),
+        openai_base_url=openai_config.get('base_url'),
+        openai_no_think=openai_config.get('no_think', False)
+    )
+
+
 # 初始化分析器（使用缓存，但允许刷新）
 @st.cache_resource
 def init_analyzer():
     """初始化分析器（缓存）"""
-    import yaml
-    from pathlib import Path
-    
-    # 读取配置文件
-    config_path = Path(__file__).parent.parent / "config" / "config.yaml"
-    use_database = False
-    model_type = "local"
-    model_path = "models/qwen-0.6b.gguf"
-    n_ctx = 2048
-    n_threads = 4
-    openai_api_key = None
-    openai_model = "gpt-3.5-turbo"
-    openai_base_url = None
-    openai_no_think = False
+    return TemperatureAnalyzer(**vars(_load_config()))
+
+
+# 设备列表和统计信息按数据版本缓存：每次交互都会重新运行脚本，
+# 缓存后各页面和侧边栏不必在每次重新运行时重复遍历数据
+@st.cache_data(ttl=30)
+def _cached_device_list(_analyzer, version: int):
+    """设备列表（缓存，参数 version 为数据版本号，_analyzer 不参与缓存键）"""
+    return _analyzer.get_device_list()
+
+
+@st.cache_data(ttl=30)
+def _cached_load_time(version: int) -> str:
+    """数据加载时间（缓存，与数据缓存一同过期或随刷新更新，其他交互不改变，参数 version 为数据版本号）"""
+    return datetime.now().strftime('%H:%M:%S')
+
+
+@st.cache_data(ttl=30)
+def _cached_device_options(_analyzer, version: int) -> dict:
+    """设备选择框选项：显示名称 -> 设备ID（缓存，每次调用返回副本，可以添加选项）"""
+    devices = _cached_device_list(_analyzer, version)
+    return {f"{d['device_name']} ({d['device_id']})": d['device_id'] for d in devices}
+
+
+@st.cache_data(ttl=30)
+def _cached_statistics(_analyzer, version: int):
+    """所有设备的统计信息（缓存，参数 version 为数据版本号，_analyzer 不参与缓存键）"""
+    return _analyzer.data_loader.get_statistics()
+
+
+@st.cache_data(ttl=30)
+def _cached_device_overview(_analyzer, device_id: str, version: int) -> dict:
+    """设备概览：统计、最新读数、趋势和异常，不含LLM分析（缓存，参数 version 为数据版本号）"""
+    return _analyzer.get_device_overview(device_id)
+
+
+@st.cache_data(ttl=30)
+def _cached_device_analysis(_analyzer, device_id: str, analysis_type: str,
+                            start_time, end_time, version: int) -> dict:
+    """设备分析结果（含LLM分析，缓存，参数 version 为数据版本号）"""
+    return _analyzer.analyze_device(device_id, analysis_type,
+                                    start_time=start_time, end_time=end_time)
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _cached_chart_data(_analyzer, device_id: str, version: int) -> dict:
+    """设备图表数据（缓存，拖动时间窗口等交互不再重新读取，参数 version 为数据版本号）"""
+    return _analyzer.get_temperature_chart_data(device_id)
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _cached_device_dataframe(_analyzer, device_id: str, version: int) -> pd.DataFrame:
+    """设备原始数据表（缓存，参数 version 为数据版本号）"""
+    return _analyzer.get_dataframe(device_id)
+
+
+@st.cache_data(ttl=30)
+def _cached_device_frame(_analyzer, version: int, lang: str) -> pd.DataFrame:
+    """设备列表表格（缓存，列名按语言翻译，参数 version 为数据版本号）"""
+    devices = _cached_device_list(_analyzer, version)
+    columns = ["device_id", "device_name", "location", "readings_count"]
+    df = pd.DataFrame.from_records(devices, columns=columns)
+    return df.rename(columns={col: get_text(col, lang) for col in columns})
+
+
+# 异常表格的列 -> 列名翻译键
+_ANOMALY_COLUMNS = {
+    "timestamp": "timestamp_col",
+    "temperature": "temp_col",
+    "z_score": "z_score",
+    "anomaly_type": "type_col",
+}
+
+
+@st.cache_data(ttl=30)
+def _cached_anomaly_frame(_analyzer, device_id: str, version: int, lang: str) -> pd.DataFrame:
+    """设备异常表格（缓存，由异常记录一次构造，列名按语言翻译，参数 version 为数据版本号）"""
+    anomalies = _cached_device_overview(_analyzer, device_id, version)['anomalies']
+    df = pd.DataFrame.from_records(anomalies, columns=list(_ANOMALY_COLUMNS))
+    return df.rename(columns={col: get_text(key, lang) for col, key in _ANOMALY_COLUMNS.items()})
+
+
+def _metric_row(items):
+    """
+    用一个HTML网格渲染一行不带增量箭头的指标（一个页面元素代替多列 st.metric）
+    
+    Args:
+        items: (标签, 值) 列表
+    """
+    cells = "".join(
+        f'<div class="metric-card"><div class="metric-label">{html.escape(str(label))}</div>'
+        f'<div class="metric-value">{html.escape(str(value))}</div></div>'
+        for label, value in items
+    )
+    st.markdown(
+        f'<div class="metric-grid" style="grid-template-columns: repeat({len(items)}, 1fr);">'
+        f'{cells}</div>',
+        unsafe_allow_html=True
+    )
+
+
+# 状态的显示图标；趋势文本 -> (翻译键, 图标)，一次查找同时取得两者
+_STATUS_EMOJI = {"normal": "✅", "warning": "⚠️", "alert": "🚨"}
+_TRENDS = {"上升": ("rising", "📈"), "下降": ("falling", "📉"), "稳定": ("stable", "➡️")}
+
+# 温湿度双轴图的布局：与 make_subplots(specs=[[{"secondary_y": True}]]) 生成的坐标轴相同，
+# 直接写出布局，不必导入 plotly.subplots
+_DUAL_AXIS_LAYOUT = {
+    "xaxis": {"anchor": "y", "domain": [0.0, 0.94]},
+    "yaxis": {"anchor": "x", "domain": [0.0, 1.0]},
+    "yaxis2": {"anchor": "x", "overlaying": "y", "side": "right"},
+    "height": 400,
+    "hovermode": "x",
+}
+
+# 综合分析页的分析类型 -> 显示名称的翻译键
+_ANALYSIS_TYPE_LABEL_KEYS = {
+    "comprehensive": "analysis_comprehensive",
+    "anomaly": "analysis_anomaly",
+    "trend": "analysis_trend",
+    "recommendation": "analysis_recommendation",
+}
+
+# 原始数据表格显示的最近行数（完整数据可下载）
+_RAW_DATA_ROWS = 200
+
+# 图表最多绘制的点数，超过时按LTTB降采样（原始数据表格不受影响）
+_MAX_CHART_POINTS = 2000
+
+# 点数不超过该值时温度趋势图同时绘制数据点标记，点数更多时只画折线（标记互相重叠，只增加绘制开销）
+_MARKER_MAX_POINTS = 500
+
+# 流式输出时两次页面更新的最小间隔（秒）
+_STREAM_FLUSH_INTERVAL = 0.08
+
+
+def _chart_series(chart_data: dict) -> dict:
+    """
+    确保图表列数据为NumPy数组，点数较多时降采样
     
-    if config_path.exists():
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = yaml.safe_load(f)
-            
-            # 数据源配置
-            data_config = config.get('data', {})
-            use_database = data_config.get('source', 'json') == 'database'
-            
-            # 模型配置
-            model_config = config.get('model', {})
-            model_type = model_config.get('type', 'local')
-            model_path = model_config.get('path', 'models/qwen-0.6b.gguf')
-            n_ctx = model_config.get('n_ctx', 2048)
-            n_threads = model_config.get('n_threads', 4)
-            
-            # OpenAI配置
-            openai_config = config.get('openai', {})
-            openai_api_key = openai_config.get('api_key')
-            openai_model = openai_config.get('model', 'gpt-3.5-turbo')
-            openai_base_url = openai_config.get('base_url')
-            openai_no_think = openai_config.get('no_think', False)
-    
-    return TemperatureAnalyzer(
-        use_database=use_database,
-        model_type=model_type,
-        model_path=model_path,
-        n_ctx=n_ctx,
-        n_threads=n_threads,
-        openai_api_key=openai_api_key,
-        openai_model=openai_model,
-        openai_base_url=openai_base_url,
-        openai_no_think=openai_no_think
+    Plotly校验数组时不逐个检查元素，比传入Python列表快得多。降采样时温度和湿度
+    各自按LTTB选点，取两者下标的并集，保留各自的峰谷。
+    
+    Args:
+        chart_data: get_temperature_chart_data 返回的列数据
+        
+    Returns:
+        包含 timestamps/temperatures/humidity 数组的字典（没有湿度数据时 humidity 为None）；
+        各曲线共用同一个 timestamps 数组
+    """
+    timestamps = np.asarray(chart_data['timestamps'], dtype='datetime64[s]')
+    temperatures = np.asarray(chart_data['temperatures'], dtype=np.float64)
+    humidity = (np.asarray(chart_data['humidity'], dtype=np.float64)
+                if len(chart_data['humidity']) else None)
+    # 湿度全部缺失（NaN）时按没有湿度数据处理：不参与降采样，也不绘制双轴图
+    if humidity is not None and np.isnan(humidity).all():
+        humidity = None
+    
+    if timestamps.size > _MAX_CHART_POINTS:
+        # 横坐标使用实际时间（秒），采样间隔不均匀（如数据中断）时三角形面积仍然准确
+        seconds = timestamps.astype(np.int64).astype(np.float64)
+        seconds[np.isnat(timestamps)] = np.nan
+        idx = lttb_indices(seconds, temperatures, _MAX_CHART_POINTS)
+        if humidity is not None:
+            idx = np.union1d(idx, lttb_indices(seconds, humidity, _MAX_CHART_POINTS))
+        timestamps = timestamps[idx]
+        temperatures = temperatures[idx]
+        if humidity is not None:
+            humidity = humidity[idx]
+    
+    return {'timestamps': timestamps, 'temperatures': temperatures, 'humidity': humidity}
+
+
+def _chart_window(chart_data: dict, device_id: str):
+    """
+    数据点超过绘制上限时显示时间窗口滑块，返回选择的时间窗口
+    
+    窗口内的数据仍按LTTB降采样到同样的点数，缩小窗口即可看到更多细节
+    （相当于按可视范围重新降采样）。
+    
+    Args:
+        chart_data: 按时间排序的图表列数据
+        device_id: 设备ID（切换设备时滑块重置）
+        
+    Returns:
+        (开始时间, 结束时间)；时间戳无法确定范围时为None（使用全部数据）
+    """
+    timestamps = np.asarray(chart_data['timestamps'], dtype='datetime64[s]')
+    if np.isnat(timestamps[0]) or np.isnat(timestamps[-1]) or timestamps[0] >= timestamps[-1]:
+        return None
+    first = timestamps[0].astype(datetime)
+    last = timestamps[-1].astype(datetime)
+    
+    return st.slider(
+        t("chart_time_window"),
+        min_value=first,
+        max_value=last,
+        value=(first, last),
+        step=timedelta(minutes=1),
+        format="YYYY-MM-DD HH:mm",
+        key=f"chart_window_{device_id}"
     )
 
 
+def _slice_window(chart_data: dict, window) -> dict:
+    """
+    截取时间窗口内的列数据
+    
+    Args:
+        chart_data: 按时间排序的图表列数据
+        window: (开始时间, 结束时间)
+        
+    Returns:
+        时间窗口内的列数据
+    """
+    timestamps = np.asarray(chart_data['timestamps'], dtype='datetime64[s]')
+    start, end = window
+    # 时间戳已排序，二分查找窗口边界
+    lo = np.searchsorted(timestamps, np.datetime64(start, 's'), side='left')
+    hi = np.searchsorted(timestamps, np.datetime64(end, 's'), side='right')
+    return {key: values[lo:hi] if len(values) else values for key, values in chart_data.items()}
+
+
+# 局部重跑装饰器：片段内的控件触发重新运行时只执行该片段（Streamlit>=1.37 为 st.fragment，
+# 1.33-1.36 为 st.experimental_fragment），旧版本退化为普通函数
+_fragment = (getattr(st, "fragment", None)
+             or getattr(st, "experimental_fragment", None)
+             or (lambda func: func))
+
+
+def _throttle_stream(chunks, interval: float = _STREAM_FLUSH_INTERVAL):
+    """
+    合并间隔内到达的文本片段后再输出
+    
+    st.write_stream 每收到一个片段都会把累计的全文重新发送到前端并重新渲染，
+    片段合并后页面更新次数与生成速度无关，最多每个间隔一次。
+    
+    Args:
+        chunks: 文本片段迭代器
+        interval: 两次输出的最小间隔（秒）
+        
+    Yields:
+        合并后的文本片段
+    """
+    pending = []
+    # 第一个片段立即输出，不推迟首字显示
+    last_flush = 0.0
+    for chunk in chunks:
+        pending.append(chunk)
+        now = time.monotonic()
+        if now - last_flush >= interval:
+            yield ''.join(pending)
+            pending.clear()
+            last_flush = now
+    
+    # 输出剩余的片段
+    if pending:
+        yield ''.join(pending)
+
+
+def _stream_analysis(analyzer, device_id: str, analysis_type: str, spinner_text: str,
+                     start_time=None, end_time=None):
+    """
+    流式输出设备的LLM分析，完成后替换为后处理后的文本
+    
+    Args:
+        analyzer: 分析器
+        device_id: 设备ID
+        analysis_type: 分析类型
+        spinner_text: 生成期间显示的提示文字
+        start_time: 开始时间 (ISO格式字符串)
+        end_time: 结束时间 (ISO格式字符串)
+    """
+    # st.write_stream 增量追加片段；片段按时间间隔合并，减少页面更新次数
+    analysis_placeholder = st.empty()
+    
+    with st.spinner(spinner_text):
+        with analysis_placeholder.container():
+            full_text = st.write_stream(_throttle_stream(analyzer.analyze_device_stream(
+                device_id,
+                analysis_type,
+                start_time=start_time,
+                end_time=end_time
+            )))
+    
+    # 后处理（复用分析器已创建的LLM服务，后处理不依赖实例状态，不会构造新的服务）
+    cleaned_text = analyzer.llm_service.postprocess(full_text)
+    analysis_placeholder.markdown(cleaned_text)
+
+
 # 主应用
 def main():
     # 初始化分析器
     analyzer = init_analyzer()
     
+    # 数据版本号，点击刷新按钮时递增
+    st.session_state.setdefault("data_version", 0)
+    
+    # 当前语言在每次运行开始时读取一次，侧边栏标签按属性从该语言的翻译命名空间取值，
+    # 不必每个标签都访问一次 session_state；切换语言会触发 st.rerun()，下次运行重新取得
+    current_lang = get_language()
+    T = labels(current_lang)
+    data_version = st.session_state["data_version"]
+    
+    # 设备列表每次运行只取一次，侧边栏和页面共用
+    devices = _cached_device_list(analyzer, data_version)
+    last_update = _cached_load_time(data_version)
+    
     # 侧边栏
     with st.sidebar:
-        st.header(t("nav"))
+        st.header(T.nav)
         
         # 语言切换
         lang_options = {"中文": "zh", "English": "en"}
-        current_lang = get_language()
         
-        # 页面选择
-        page_options = [t("page_overview"), t("page_detail"), t("page_analysis"), t("page_visualization")]
+        # 页面选择：选项为页面名称的翻译键，显示时才翻译（切换语言后仍停留在当前页面）
         page = st.radio(
-            t("nav"),
-            page_options,
+            T.nav,
+            list(_PAGES),
+            format_func=t,
             label_visibility="collapsed"
         )
         
         # 语言切换器
         st.divider()
-        col1, col2 = st.columns([1, 1])
-        with col1:
-            st.caption("🌐 Language")
-        with col2:
-            new_lang_name = st.selectbox(
-                "Language",
-                options=list(lang_options.keys()),
-                index=0 if current_lang == "zh" else 1,
-                label_visibility="collapsed",
-                key="lang_selector"
-            )
-            new_lang = lang_options[new_lang_name]
-            if new_lang != current_lang:
-                set_language(new_lang)
-                st.rerun()
+        new_lang_name = st.selectbox(
+            "🌐 Language",
+            options=list(lang_options.keys()),
+            index=0 if current_lang == "zh" else 1,
+            key="lang_selector"
+        )
+        new_lang = lang_options[new_lang_name]
+        if new_lang != current_lang:
+            set_language(new_lang)
+            st.rerun()
         
         st.divider()
         
         # 手动刷新按钮
-        if st.button(t("refresh_data"), width='stretch', key="manual_refresh_btn"):
+        if st.button(T.refresh_data, width='stretch', key="manual_refresh_btn"):
             # 清除缓存以强制刷新
-            if hasattr(analyzer.data_loader, 'clear_cache'):
-                analyzer.data_loader.clear_cache()
+            analyzer.data_processor.clear_cache()
+            st.cache_data.clear()
+            st.session_state["data_version"] += 1
             st.rerun()
         
         st.divider()
         
         # 模型状态
-        st.subheader(t("model_status"))
+        st.subheader(T.model_status)
         model_info = analyzer.llm_service.get_model_info()
         if analyzer.llm_service.is_available():
             if model_info['type'] == 'OpenAI':
-                st.success(f"{t('openai_connected')} ({model_info['model']})")
+                st.success(f"{T.openai_connected} ({model_info['model']})")
             else:
-                st.success(t("local_model_loaded"))
-                st.caption(f"{t('model_name')}: {Path(model_info['model']).name}")
+                st.success(T.local_model_loaded)
+                st.caption(f"{T.model_name}: {Path(model_info['model']).name}")
         else:
             if model_info['type'] == 'OpenAI':
-                st.warning(t("openai_failed"))
-                st.info(t("openai_hint"))
+                st.warning(T.openai_failed)
+                st.info(T.openai_hint)
             else:
-                st.warning(t("using_mock_mode"))
-                st.info(t("mock_mode_hint"))
+                st.warning(T.using_mock_mode)
+                st.info(T.mock_mode_hint)
         
         st.divider()
         
         # 数据信息
-        st.subheader(t("data_info"))
-        devices = analyzer.get_device_list()
-        st.metric(t("device_count"), len(devices))
-        total_readings = sum(d['readings_count'] for d in devices)
-        st.metric(t("total_readings"), total_readings)
+        st.subheader(T.data_info)
+        st.metric(T.device_count, len(devices))
+        st.metric(T.total_readings, sum(map(operator.itemgetter('readings_count'), devices)))
         
         # 显示最后更新时间
-        from datetime import datetime
-        st.caption(f"{t('last_update')}: {datetime.now().strftime('%H:%M:%S')}")
+        st.caption(f"{T.last_update}: {last_update}")
     
     # 根据选择的页面显示内容
-    if page == t("page_overview"):
-        show_device_overview(analyzer)
-    elif page == t("page_detail"):
-        show_device_detail(analyzer)
-    elif page == t("page_analysis"):
-        show_comprehensive_analysis(analyzer)
-    elif page == t("page_visualization"):
-        show_data_visualization(analyzer)
-
-def show_device_overview(analyzer):
+    _PAGES[page](analyzer, devices)
+
+def show_device_overview(analyzer, devices):
     """显示设备概览"""
     st.header(t("device_overview"))
     
-    devices = analyzer.get_device_list()
-    
     if not devices:
         st.warning(t("no_devices"))
         return
@@ -221,63 +523,51 @@ def show_device_overview(analyzer):
     
     # 设备列表表格
     st.subheader(t("device_list"))
-    device_data = {
-        t("device_id"): [d['device_id'] for d in devices],
-        t("device_name"): [d['device_name'] for d in devices],
-        t("location"): [d['location'] for d in devices],
-        t("readings_count"): [d['readings_count'] for d in devices]
-    }
-    st.dataframe(device_data, width='stretch', hide_index=True)
+    device_df = _cached_device_frame(analyzer, st.session_state["data_version"], get_language())
+    st.dataframe(device_df, width='stretch', hide_index=True)
     
     # 快速统计
     st.subheader(t("quick_stats"))
-    all_stats = analyzer.data_loader.get_statistics()
-    
-    col1, col2, col3, col4 = st.columns(4)
-    with col1:
-        st.metric(t("avg_temperature"), f"{all_stats.get('avg_temperature', 0):.2f}°C")
-    with col2:
-        st.metric(t("min_temperature"), f"{all_stats.get('min_temperature', 0):.2f}°C")
-    with col3:
-        st.metric(t("max_temperature"), f"{all_stats.get('max_temperature', 0):.2f}°C")
-    with col4:
-        st.metric(t("temperature_range"), f"{all_stats.get('temperature_range', 0):.2f}°C")
+    all_stats = _cached_statistics(analyzer, st.session_state["data_version"])
+    
+    _metric_row([
+        (t("avg_temperature"), f"{all_stats.get('avg_temperature', 0):.2f}°C"),
+        (t("min_temperature"), f"{all_stats.get('min_temperature', 0):.2f}°C"),
+        (t("max_temperature"), f"{all_stats.get('max_temperature', 0):.2f}°C"),
+        (t("temperature_range"), f"{all_stats.get('temperature_range', 0):.2f}°C")
+    ])
 
-def show_device_detail(analyzer):
+def show_device_detail(analyzer, devices):
     """显示设备详情"""
     st.header(t("device_detail"))
     
-    devices = analyzer.get_device_list()
     if not devices:
         st.warning(t("no_devices"))
         return
     
     # 设备选择
-    device_options = {f"{d['device_name']} ({d['device_id']})": d['device_id'] 
-                     for d in devices}
+    device_options = _cached_device_options(analyzer, st.session_state["data_version"])
     selected_device_name = st.selectbox(t("select_device"), list(device_options.keys()))
     device_id = device_options[selected_device_name]
     
     st.divider()
     
-    # 加载分析结果
+    # 加载基础分析结果（统计、趋势、异常）；LLM分析在下方按输出方式单独生成
     with st.spinner(t("analyzing_data")):
-        analysis = analyzer.analyze_device(device_id)
+        analysis = _cached_device_overview(analyzer, device_id, st.session_state["data_version"])
     
     # 统计信息
     st.subheader(t("statistics"))
     stats = analysis['statistics']
     
-    col1, col2, col3, col4 = st.columns(4)
-    with col1:
-        st.metric(t("avg_temperature"), f"{stats.get('avg_temperature', 0):.2f}°C")
-    with col2:
-        st.metric(t("min_temperature"), f"{stats.get('min_temperature', 0):.2f}°C")
-    with col3:
-        st.metric(t("max_temperature"), f"{stats.get('max_temperature', 0):.2f}°C")
-    with col4:
-        st.metric(t("total_readings"), stats.get('total_readings', 0))
+    _metric_row([
+        (t("avg_temperature"), f"{stats.get('avg_temperature', 0):.2f}°C"),
+        (t("min_temperature"), f"{stats.get('min_temperature', 0):.2f}°C"),
+        (t("max_temperature"), f"{stats.get('max_temperature', 0):.2f}°C"),
+        (t("total_readings"), stats.get('total_readings', 0))
+    ])
     
+    # 状态计数保留 st.metric 的增量标记
     col1, col2, col3 = st.columns(3)
     with col1:
         st.metric(t("normal"), stats.get('normal_count', 0), delta=t("normal_status"))
@@ -290,107 +580,78 @@ def show_device_detail(analyzer):
     st.subheader(t("latest_reading"))
     latest = analysis['latest_reading']
     if latest:
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            st.metric(t("time"), latest['timestamp'])
-        with col2:
-            st.metric(t("temperature"), f"{latest['temperature']}°C")
-        with col3:
-            st.metric(t("humidity"), f"{latest['humidity']}%")
-        with col4:
-            status_map = {"normal": t("normal"), "warning": t("warning"), "alert": t("alert")}
-            status_emoji = {"normal": "✅", "warning": "⚠️", "alert": "🚨"}.get(latest['status'], "❓")
-            st.metric(t("status"), f"{status_emoji} {status_map.get(latest['status'], latest['status'])}")
+        status = latest['status']
+        status_emoji = _STATUS_EMOJI.get(status, "❓")
+        status_display = t(status) if status in _STATUS_EMOJI else status
+        _metric_row([
+            (t("time"), latest['timestamp']),
+            (t("temperature"), f"{latest['temperature']}°C"),
+            (t("humidity"), f"{latest['humidity']}%"),
+            (t("status"), f"{status_emoji} {status_display}")
+        ])
     
     # 趋势分析
     st.subheader(t("trend_analysis"))
     trend = analysis['trend']
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.metric(t("current_temp"), f"{trend.get('current_temp', 0):.2f}°C")
-    with col2:
-        trend_text = trend.get('trend', 'N/A')
-        # 处理趋势文本翻译
-        if trend_text == "上升":
-            trend_display = t("rising")
-        elif trend_text == "下降":
-            trend_display = t("falling")
-        elif trend_text == "稳定":
-            trend_display = t("stable")
-        else:
-            trend_display = trend_text
-        trend_emoji = "📈" if trend_text == "上升" else "📉" if trend_text == "下降" else "➡️"
-        st.metric(t("trend"), f"{trend_emoji} {trend_display}")
-    with col3:
-        st.metric(t("volatility"), f"{trend.get('volatility', 0):.2f}")
+    trend_text = trend.get('trend', 'N/A')
+    # 处理趋势文本翻译（未知趋势原样显示）
+    trend_key, trend_emoji = _TRENDS.get(trend_text, (None, "➡️"))
+    trend_display = t(trend_key) if trend_key else trend_text
+    _metric_row([
+        (t("current_temp"), f"{trend.get('current_temp', 0):.2f}°C"),
+        (t("trend"), f"{trend_emoji} {trend_display}"),
+        (t("volatility"), f"{trend.get('volatility', 0):.2f}")
+    ])
     
     # 异常检测
     if analysis['anomalies_count'] > 0:
         st.subheader(t("anomaly_detection"))
         st.warning(t("anomalies_detected", count=analysis['anomalies_count']))
-        anomalies_df = {
-            t("timestamp_col"): [a['timestamp'] for a in analysis['anomalies']],
-            t("temp_col"): [a['temperature'] for a in analysis['anomalies']],
-            t("z_score"): [a['z_score'] for a in analysis['anomalies']],
-            t("type_col"): [a['anomaly_type'] for a in analysis['anomalies']]
-        }
+        anomalies_df = _cached_anomaly_frame(analyzer, device_id, st.session_state["data_version"],
+                                             get_language())
         st.dataframe(anomalies_df, width='stretch', hide_index=True)
     else:
         st.success(t("no_anomalies"))
     
-    # LLM分析（流式输出）
+    # LLM分析（流式输出）；放在局部重跑片段中，切换输出方式时不重新执行整个页面
+    _device_ai_section(analyzer, device_id)
+
+
+@_fragment
+def _device_ai_section(analyzer, device_id: str):
+    """设备详情页的AI分析区域"""
     st.subheader(t("ai_analysis"))
     
     # 添加流式输出选项
     use_stream = st.checkbox(t("enable_stream"), value=True, help=t("stream_hint"))
     
     if use_stream:
-        # 流式输出
-        analysis_placeholder = st.empty()
-        full_text = ""
-        
-        with st.spinner(t("generating_analysis")):
-            for chunk in analyzer.analyze_device_stream(device_id, "comprehensive"):
-                full_text += chunk
-                analysis_placeholder.markdown(full_text)
-        
-        # 完成后进行后处理
-        from src.llm_service import LLMService
-        temp_llm = LLMService()
-        cleaned_text = temp_llm._remove_repetition(full_text)
-        cleaned_text = temp_llm._clean_prompt_artifacts(cleaned_text)
-        analysis_placeholder.markdown(cleaned_text)
+        _stream_analysis(analyzer, device_id, "comprehensive", t("generating_analysis"))
     else:
         # 传统方式（一次性输出）
         with st.spinner(t("analyzing_data")):
-            analysis = analyzer.analyze_device(device_id)
+            analysis = _cached_device_analysis(analyzer, device_id, "comprehensive",
+                                               None, None, st.session_state["data_version"])
         st.markdown(analysis['llm_analysis'])
 
-def show_comprehensive_analysis(analyzer):
+def show_comprehensive_analysis(analyzer, devices):
     """显示综合分析"""
     st.header(t("comprehensive_analysis"))
     
-    # 分析类型选择
-    analysis_type_options = [t("analysis_comprehensive"), t("analysis_anomaly"), 
-                             t("analysis_trend"), t("analysis_recommendation")]
+    if not devices:
+        st.warning(t("no_devices"))
+        return
+    
+    # 分析类型选择：选项直接是分析类型，显示名称按当前语言翻译，不需要反向映射
     analysis_type = st.radio(
         t("select_analysis_type"),
-        analysis_type_options,
+        list(_ANALYSIS_TYPE_LABEL_KEYS),
+        format_func=lambda kind: t(_ANALYSIS_TYPE_LABEL_KEYS[kind]),
         horizontal=True
     )
     
-    # 创建反向映射
-    analysis_type_map = {
-        t("analysis_comprehensive"): "comprehensive",
-        t("analysis_anomaly"): "anomaly",
-        t("analysis_trend"): "trend",
-        t("analysis_recommendation"): "recommendation"
-    }
-    
     # 设备选择（可选）
-    devices = analyzer.get_device_list()
-    device_options = {f"{d['device_name']} ({d['device_id']})": d['device_id'] 
-                     for d in devices}
+    device_options = _cached_device_options(analyzer, st.session_state["data_version"])
     device_options[t("all_devices")] = None
     
     selected_device_name = st.selectbox(t("select_device_optional"), list(device_options.keys()))
@@ -424,6 +685,15 @@ def show_comprehensive_analysis(analyzer):
         if end_date:
             end_time = end_date.isoformat() + "T23:59:59"
     
+    # 输出方式和执行按钮放在局部重跑片段中，点击开始分析时不重新执行侧边栏和上方的筛选区域
+    _analysis_run_section(analyzer, device_id, analysis_type,
+                          start_time, end_time)
+
+
+@_fragment
+def _analysis_run_section(analyzer, device_id, analysis_type: str,
+                          start_time, end_time):
+    """综合分析页的执行区域（输出方式选项、开始按钮和分析结果）"""
     # 流式输出选项
     st.divider()
     use_stream = st.checkbox(t("enable_stream"), value=True, help=t("stream_hint"))
@@ -432,34 +702,18 @@ def show_comprehensive_analysis(analyzer):
     if st.button(t("start_analysis"), type="primary"):
         if device_id:
             if use_stream:
-                # 流式输出
-                analysis_placeholder = st.empty()
-                full_text = ""
-                
-                with st.spinner(t("generating_report")):
-                    for chunk in analyzer.analyze_device_stream(
-                        device_id, 
-                        analysis_type_map[analysis_type],
-                        start_time=start_time,
-                        end_time=end_time
-                    ):
-                        full_text += chunk
-                        analysis_placeholder.markdown(full_text)
-                
-                # 后处理
-                from src.llm_service import LLMService
-                temp_llm = LLMService()
-                cleaned_text = temp_llm._remove_repetition(full_text)
-                cleaned_text = temp_llm._clean_prompt_artifacts(cleaned_text)
-                analysis_placeholder.markdown(cleaned_text)
+                _stream_analysis(analyzer, device_id, analysis_type, t("generating_report"),
+                                 start_time=start_time, end_time=end_time)
             else:
                 # 传统方式
                 with st.spinner(t("generating_report")):
-                    analysis = analyzer.analyze_device(
+                    analysis = _cached_device_analysis(
+                        analyzer,
                         device_id, 
-                        analysis_type_map[analysis_type],
-                        start_time=start_time,
-                        end_time=end_time
+                        analysis_type,
+                        start_time,
+                        end_time,
+                        st.session_state["data_version"]
                     )
                     st.markdown(analysis['llm_analysis'])
         else:
@@ -468,71 +722,150 @@ def show_comprehensive_analysis(analyzer):
                 all_analysis = analyzer.get_all_devices_analysis()
                 st.markdown(all_analysis['llm_analysis'])
 
-def show_data_visualization(analyzer):
-    """显示数据可视化"""
-    st.header(t("data_visualization"))
-    
-    devices = analyzer.get_device_list()
-    if not devices:
-        st.warning(t("no_devices"))
-        return
-    
-    # 设备选择
-    device_options = {f"{d['device_name']} ({d['device_id']})": d['device_id'] 
-                     for d in devices}
-    selected_device_name = st.selectbox(t("select_device"), list(device_options.keys()))
-    device_id = device_options[selected_device_name]
+@st.cache_resource(ttl=30, max_entries=64, show_spinner=False)
+def _cached_chart_figures(_analyzer, device_id: str, version: int, window, lang: str):
+    """
+    构建可视化页的两张图（缓存，参数 version 为数据版本号）
+    
+    切换页面后返回或重复选择同一时间窗口时直接使用缓存的图表，
+    不再重新降采样和构建Plotly对象。缓存的是Figure对象本身（各会话共享，不应修改）：
+    st.plotly_chart 收到Figure时不再重新校验，而字典或反序列化的副本会被重新校验一遍。
+    
+    Args:
+        _analyzer: 分析器（不参与缓存键）
+        device_id: 设备ID
+        version: 数据版本号
+        window: (开始时间, 结束时间)，None 表示全部数据
+        lang: 语言代码（图表标签按该语言翻译）
+        
+    Returns:
+        (温度趋势图, 温湿度双轴图)；没有湿度数据时双轴图为None
+    """
+    # Plotly只在本页面使用，首次构建图表时才导入，其他页面不承担导入开销
+    import plotly.graph_objects as go
     
-    # 获取图表数据
-    chart_data = analyzer.get_temperature_chart_data(device_id)
+    chart_data = _cached_chart_data(_analyzer, device_id, version)
+    if window is not None:
+        chart_data = _slice_window(chart_data, window)
     
-    if not chart_data['timestamps']:
-        st.warning(t("no_data"))
-        return
+    # 转为数组，点数较多时降采样后再绘制；使用WebGL渲染（Scattergl）
+    chart_data = _chart_series(chart_data)
     
     # 温度趋势图
-    st.subheader(t("temperature_trend"))
+    show_markers = len(chart_data['timestamps']) <= _MARKER_MAX_POINTS
     fig_temp = go.Figure()
-    fig_temp.add_trace(go.Scatter(
+    fig_temp.add_trace(go.Scattergl(
         x=chart_data['timestamps'],
         y=chart_data['temperatures'],
-        mode='lines+markers',
-        name=t("temperature"),
+        mode='lines+markers' if show_markers else 'lines',
+        name=get_text("temperature", lang),
         line=dict(color='#1f77b4', width=2),
-        marker=dict(size=6)
+        marker=dict(size=6) if show_markers else None
     ))
+    # 降采样后每条曲线最多 _MAX_CHART_POINTS 个点（两条曲线的并集不超过两倍），
+    # 远低于 Scattergl 悬停检测开始卡顿的规模，悬停提示可以一直保留；
+    # uirevision 按设备固定，语言切换等重新运行后保留用户的缩放和平移
     fig_temp.update_layout(
-        xaxis_title=t("time_label"),
-        yaxis_title=t("temp_label"),
-        hovermode='x unified',
+        xaxis_title=get_text("time_label", lang),
+        yaxis_title=get_text("temp_label", lang),
+        hovermode='x',
+        uirevision=device_id,
         height=400
     )
-    st.plotly_chart(fig_temp, width='stretch')
     
     # 温度和湿度双轴图
-    if chart_data['humidity']:
-        st.subheader(t("temp_humidity"))
-        fig_dual = make_subplots(specs=[[{"secondary_y": True}]])
+    fig_dual = None
+    if chart_data['humidity'] is not None:
+        fig_dual = go.Figure(layout=_DUAL_AXIS_LAYOUT)
         fig_dual.add_trace(
-            go.Scatter(x=chart_data['timestamps'], y=chart_data['temperatures'],
-                      name=t("temperature"), line=dict(color='#ff7f0e')),
-            secondary_y=False
+            go.Scattergl(x=chart_data['timestamps'], y=chart_data['temperatures'],
+                      name=get_text("temperature", lang), line=dict(color='#ff7f0e'))
         )
         fig_dual.add_trace(
-            go.Scatter(x=chart_data['timestamps'], y=chart_data['humidity'],
-                      name=t("humidity"), line=dict(color='#2ca02c')),
-            secondary_y=True
+            go.Scattergl(x=chart_data['timestamps'], y=chart_data['humidity'],
+                      name=get_text("humidity", lang), line=dict(color='#2ca02c'), yaxis='y2')
+        )
+        fig_dual.update_layout(
+            xaxis_title_text=get_text("time_label", lang),
+            yaxis_title_text=get_text("temp_label", lang),
+            yaxis2_title_text=get_text("humidity_label", lang),
+            uirevision=device_id
         )
-        fig_dual.update_xaxes(title_text=t("time_label"))
-        fig_dual.update_yaxes(title_text=t("temp_label"), secondary_y=False)
-        fig_dual.update_yaxes(title_text=t("humidity_label"), secondary_y=True)
-        fig_dual.update_layout(height=400, hovermode='x unified')
+    
+    return fig_temp, fig_dual
+
+
+@_fragment
+def _chart_section(analyzer, chart_data: dict, device_id: str):
+    """
+    可视化页的图表区域（时间窗口滑块和图表）
+    
+    作为片段运行：拖动时间窗口滑块只重新运行本区域，不重新运行侧边栏和原始数据表格。
+    
+    Args:
+        analyzer: 分析器
+        chart_data: 设备的图表列数据（非空，用于确定时间窗口范围）
+        device_id: 设备ID
+    """
+    # 点数较多时可选择时间窗口，窗口内重新降采样
+    window = None
+    if len(chart_data['timestamps']) > _MAX_CHART_POINTS:
+        window = _chart_window(chart_data, device_id)
+    
+    fig_temp, fig_dual = _cached_chart_figures(analyzer, device_id, st.session_state["data_version"],
+                                               window, get_language())
+    
+    st.subheader(t("temperature_trend"))
+    st.plotly_chart(fig_temp, width='stretch')
+    
+    if fig_dual is not None:
+        st.subheader(t("temp_humidity"))
         st.plotly_chart(fig_dual, width='stretch')
+
+
+def show_data_visualization(analyzer, devices):
+    """显示数据可视化"""
+    st.header(t("data_visualization"))
+    
+    if not devices:
+        st.warning(t("no_devices"))
+        return
+    
+    # 设备选择
+    device_options = _cached_device_options(analyzer, st.session_state["data_version"])
+    selected_device_name = st.selectbox(t("select_device"), list(device_options.keys()))
+    device_id = device_options[selected_device_name]
     
-    # 数据表格
+    # 获取图表数据
+    chart_data = _cached_chart_data(analyzer, device_id, st.session_state["data_version"])
+    
+    if len(chart_data['timestamps']) == 0:
+        st.warning(t("no_data"))
+        return
+    
+    _chart_section(analyzer, chart_data, device_id)
+    
+    # 数据表格：只显示最近的若干行，完整数据按需转换为CSV下载
     st.subheader(t("raw_data"))
-    df = analyzer.get_dataframe(device_id)
-    st.dataframe(df, width='stretch')
+    df = _cached_device_dataframe(analyzer, device_id, st.session_state["data_version"])
+    st.caption(t("raw_data_showing", shown=min(_RAW_DATA_ROWS, len(df)), total=len(df)))
+    st.dataframe(df.tail(_RAW_DATA_ROWS), width='stretch', hide_index=True)
+    if st.checkbox(t("prepare_csv_download"), value=False):
+        st.download_button(
+            t("download_full_csv"),
+            df.to_csv(index=False).encode('utf-8'),
+            file_name=f"{device_id}.csv",
+            mime="text/csv"
+        )
+
+
+# 侧边栏导航：页面名称的翻译键 -> 页面函数
+_PAGES = {
+    "page_overview": show_device_overview,
+    "page_detail": show_device_detail,
+    "page_analysis": show_comprehensive_analysis,
+    "page_visualization": show_data_visualization,
+}
 
 if __name__ == "__main__":
     main()